@@ -1,26 +1,93 @@
-import ast
+import asyncio
+import base64
+import html as html_lib
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Literal
 import pandas as pd
 import gradio as gr
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import json
+import uvicorn
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from pydantic import BaseModel, Field
 from sentence_transformers import SentenceTransformer
+import catalog
+from filter_index import FilterIndex
+from edition_groups import find_groups, load_groups
+from favorites_store import FavoritesStore, valid_token
+from result_cursor import ResultCursor
+from suggest_index import SuggestIndex
+from thumbnails import ThumbnailCache
 
 
 # ---------- Load dataset ----------
-df = pd.read_csv("data_mini_books_update.csv")
+df = catalog.read_catalog()
 model = SentenceTransformer("all-mpnet-base-v2")
 
-if "id" not in df.columns:
-    df["id"] = df.index.astype(str)
-df["authors"] = df["authors"].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
-df["genres"] = df["genres"].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+# identifies this catalog so shared caches never mix pages from two catalogs
+CATALOG_VERSION = catalog.catalog_version(df)
 
-embeddings = np.load("book_embeddings.npy")
-df['embedding'] = list(embeddings)
+# With BOOKREC_SHARED_DIR set, attach read-only to the arrays published by
+# `python catalog.py publish` instead of building a private copy per worker.
+SHARED_DIR = os.environ.get("BOOKREC_SHARED_DIR")
+if SHARED_DIR:
+    catalog_arrays = catalog.attach(SHARED_DIR, CATALOG_VERSION)
+else:
+    catalog_arrays = catalog.build_arrays(df, np.load(catalog.EMBEDDINGS_NPY))
 
 BOOKS_PER_LOAD = 12
-BOOKS_PER_REC = 100
+STREAM_FIRST_CARDS = 4  # real cards streamed ahead of the rest of the first page
+BOOKS_PER_REC = 100  # candidates ranked per block by a ResultCursor
+MAX_API_LIMIT = 100
+
+# ---------- Scoring arrays ----------
+# Everything below is built once at startup so the UI handlers and the JSON
+# API can score the whole catalog with a single matrix-vector product.
+ALPHA = 0.3  # weight for ratings
+INTEREST_CLUSTERS = 4  # max interests a multi-interest profile is reduced to
+SOFTMAX_TEMPERATURE = 0.05  # how close the per-book soft-max over interests is to a hard max
+
+book_ids = df["id"].astype(str).to_numpy()
+id_to_idx = {book_id: i for i, book_id in enumerate(book_ids)}
+avg_ratings = catalog_arrays["avg_ratings"]
+ratings_counts = catalog_arrays["ratings_counts"]
+norm_embeddings = catalog_arrays["norm_embeddings"]
+popularity = catalog_arrays["popularity"]
+popular_order = catalog_arrays["popular_order"]
+
+# lowercased search fields for keyword search; "\x00" keeps a query from
+# matching across two different authors/genres
+title_lc = df["title"].fillna("").str.lower().to_numpy()
+authors_lc = df["authors"].apply(lambda authors: "\x00".join(authors).lower()).to_numpy()
+genres_lc = df["genres"].apply(lambda genres: "\x00".join(genres).lower()).to_numpy()
+
+# genre/author/rating filters, applied before scoring
+filter_index = FilterIndex(df["genres"], df["authors"], avg_ratings, ratings_counts)
+
+# type-ahead over titles and author names, ranked by ratings_count
+suggest_index = SuggestIndex(df["title"], df["authors"], ratings_counts, book_ids, arrays=catalog_arrays)
+
+# near-duplicate editions share a group id; results keep the best book per group.
+# `python edition_groups.py` precomputes this, otherwise it is built here.
+book_groups = load_groups(CATALOG_VERSION)
+if book_groups is None:
+    book_groups = find_groups(norm_embeddings, df["title"], df["authors"])
+
+# favorites and their profile vectors, per anonymous browser token
+FAVORITES_DB = os.environ.get("BOOKREC_FAVORITES_DB", "favorites.db")
+favorites_store = FavoritesStore(FAVORITES_DB, norm_embeddings.shape[1])
+
+# resized covers served from our own static route instead of hotlinking
+THUMB_DIR = os.environ.get("BOOKREC_THUMB_DIR", "thumbnails")
+thumbnail_cache = ThumbnailCache(THUMB_DIR)
+# cover misses wait on a remote host; their own threads keep a cold grid
+# from starving the threadpool the JSON API runs on
+cover_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="covers")
 
 # ---------- Helpers ----------
 def create_book_card_html(book):
@@ -30,146 +97,348 @@ def create_book_card_html(book):
          data-title="{book['title']}" 
          data-authors="{', '.join(book['authors'])}" 
          data-genres="{', '.join(book['genres'])}" 
-         data-img="{book['image_url']}" 
+         data-img="/covers/book/{book['id']}" 
          data-desc="{book.get('description','No description available.')}">
-        <img src="{book['image_url']}" 
-             onerror="this.src='https://via.placeholder.com/150x200/667eea/white?text=No+Image'">
+        <img src="/covers/book/{book['id']}" loading="lazy"
+             onerror="this.onerror=null;this.src='/covers/placeholder.svg'">
         <div class='book-title'>{book['title']}</div>
         <div class='book-authors'>by {', '.join(book['authors'])}</div>
         <button class='fav-btn' title='Add to Favorites'>Add to Fav</button>
     </div>
     """
 
+def build_cards_html(books_df):
+    return "".join(create_book_card_html(book) for _, book in books_df.iterrows())
+
 def build_books_grid_html(books_df):
     if books_df.empty:
         return "<div class='no-books'>No books found</div>"
-    cards_html = [create_book_card_html(book) for _, book in books_df.iterrows()]
-    return f"<div class='books-grid'>{''.join(cards_html)}</div>"
+    return f"<div class='books-grid'>{build_cards_html(books_df)}</div>"
 
-def shuffle_random_books():
-    """Shuffle and return new random books"""
-    random_books = df.sample(frac=1).reset_index(drop=True)
-    first_batch = random_books.head(BOOKS_PER_LOAD)
-    html = build_books_grid_html(first_batch)
-    has_more = len(random_books) > BOOKS_PER_LOAD
-    # FIX: Return first_batch as display_state
-    return random_books, html, first_batch, 1, gr.update(visible=has_more)
+SKELETON_CARD_HTML = """
+    <div class='skeleton-card'>
+        <div class='skeleton-cover'></div>
+        <div class='skeleton-line'></div>
+        <div class='skeleton-line short'></div>
+    </div>
+    """
+
+def build_streaming_grid_html(books_df=None, total=BOOKS_PER_LOAD):
+    """Grid with the cards known so far and placeholders for the rest of the page"""
+    cards_html = build_cards_html(books_df) if books_df is not None else ""
+    filled = len(books_df) if books_df is not None else 0
+    return f"<div class='books-grid'>{cards_html}{SKELETON_CARD_HTML * max(total - filled, 0)}</div>"
+
+# ---------- Shared feeds ----------
+# Popular and Random are the same for everybody, so their pages are rendered
+# once per process and shared by all sessions. A session only keeps which
+# random permutation (seed) it is on and how many pages it has loaded.
+RANDOM_FEED_SEEDS = 64
+PRERENDERED_PAGES = 3
+FEED_PAGES = -(-len(df) // BOOKS_PER_LOAD)
+
+@lru_cache(maxsize=8)
+def random_order(seed):
+    return np.random.default_rng([seed, len(df)]).permutation(len(df))
+
+def feed_order(feed, seed):
+    return popular_order if feed == "popular" else random_order(seed)
+
+@lru_cache(maxsize=2048)
+def feed_page_cards(catalog_version, feed, seed, page):
+    start = page * BOOKS_PER_LOAD
+    return build_cards_html(df.iloc[feed_order(feed, seed)[start:start + BOOKS_PER_LOAD]])
+
+def feed_html(feed, seed, pages):
+    """Grid with the first `pages` pages of a shared feed"""
+    pages = max(1, min(pages, FEED_PAGES))
+    cards = "".join(feed_page_cards(CATALOG_VERSION, feed, seed, p) for p in range(pages))
+    return f"<div class='books-grid'>{cards}</div>"
+
+def warm_feed_cache():
+    for page in range(PRERENDERED_PAGES):
+        feed_page_cards(CATALOG_VERSION, "popular", 0, page)
+    for seed in range(RANDOM_FEED_SEEDS):
+        feed_page_cards(CATALOG_VERSION, "random", seed, 0)
+
+def initial_feeds():
+    seed = random.randrange(RANDOM_FEED_SEEDS)
+    has_more = gr.update(visible=FEED_PAGES > 1)
+    return seed, feed_html("random", seed, 1), 1, has_more, feed_html("popular", 0, 1), 1, has_more
+
+def shuffle_random_books(random_seed_state):
+    """Switch to another shared random permutation"""
+    seed = (random_seed_state + random.randrange(1, RANDOM_FEED_SEEDS)) % RANDOM_FEED_SEEDS
+    return seed, feed_html("random", seed, 1), 1, gr.update(visible=FEED_PAGES > 1)
+
+def load_more_popular(popular_page_state):
+    pages = min(popular_page_state + 1, FEED_PAGES)
+    return feed_html("popular", 0, pages), pages, gr.update(visible=pages < FEED_PAGES)
+
+warm_feed_cache()
+
+# ---------- Scoring ----------
+def score_query(query_vec, candidates=None):
+    """Blend cosine similarity to query_vec with the average rating.
+
+    Scores every book, or only the rows in candidates (aligned with it) so a
+    filtered query only pays for the books that can be returned.
+    """
+    query_vec = np.asarray(query_vec, dtype=np.float32)
+    query_vec = query_vec / max(float(np.linalg.norm(query_vec)), 1e-12)
+    if candidates is None:
+        return ALPHA * avg_ratings + (1 - ALPHA) * (norm_embeddings @ query_vec)
+    return ALPHA * avg_ratings[candidates] + (1 - ALPHA) * (norm_embeddings[candidates] @ query_vec)
+
+def score_interests(centroids, candidates=None):
+    """Like score_query, but for several unit-length interest vectors at once.
+
+    One (books x interests) matrix product, then a soft-max per book: a book
+    scores about as well as its best-matching interest, with a small bonus
+    when it sits close to more than one.
+    """
+    book_vecs = norm_embeddings if candidates is None else norm_embeddings[candidates]
+    ratings = avg_ratings if candidates is None else avg_ratings[candidates]
+    sims = book_vecs @ centroids.T
+    best = sims.max(axis=1)
+    soft_max = best + SOFTMAX_TEMPERATURE * np.log(
+        np.exp((sims - best[:, None]) / SOFTMAX_TEMPERATURE).sum(axis=1)
+    )
+    return ALPHA * ratings + (1 - ALPHA) * soft_max
+
+def top_k(scores, k):
+    """Row indices of the k highest finite scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return top[np.isfinite(scores[top])]
+
+def top_k_collapsed(scores, k, candidates=None):
+    """Like top_k, but with at most one book per edition group.
+
+    Over-fetches and doubles the fetch until k distinct groups are found or
+    the scores run out.
+    """
+    fetch = 2 * k
+    while True:
+        top = top_k(scores, fetch)
+        rows = top if candidates is None else candidates[top]
+        # np.unique returns each group's first (= best scored) position
+        _, first = np.unique(book_groups[rows], return_index=True)
+        top = top[np.sort(first)]
+        if len(top) >= k or fetch >= len(scores):
+            return top[:k]
+        fetch *= 2
+
+def favorite_indices(favorite_ids):
+    """Row indices of the favorites that exist in the catalog, duplicates dropped"""
+    return list(dict.fromkeys(id_to_idx[f] for f in favorite_ids if f in id_to_idx))
+
+def interest_centroids(fav_idx, k=INTEREST_CLUSTERS, iterations=10):
+    """Unit-length interest vectors from spherical k-means over the favorites.
+
+    With k or fewer favorites every favorite is its own interest.
+    """
+    fav_vecs = norm_embeddings[fav_idx]
+    if len(fav_vecs) <= k:
+        return np.array(fav_vecs)
+
+    # farthest-point seeding, deterministic for the same favorites
+    centroids = [fav_vecs[0]]
+    for _ in range(k - 1):
+        nearest = (fav_vecs @ np.array(centroids).T).max(axis=1)
+        centroids.append(fav_vecs[np.argmin(nearest)])
+    centroids = np.array(centroids)
+
+    for _ in range(iterations):
+        assignment = (fav_vecs @ centroids.T).argmax(axis=1)
+        for j in range(k):
+            members = fav_vecs[assignment == j]
+            if len(members):
+                centroids[j] = members.mean(axis=0)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+def favorites_profile(fav_idx, mode="blend"):
+    """One averaged vector ("blend") or a few interest centroids ("multi")"""
+    if mode == "multi":
+        return interest_centroids(fav_idx)
+    return norm_embeddings[fav_idx].mean(axis=0)
+
+def favorites_scores(fav_idx, profile, candidates=None):
+    """Scores for a favorites profile; favorites and their other editions are masked out with -inf"""
+    if profile.ndim == 2:
+        scores = score_interests(profile, candidates)
+    else:
+        scores = score_query(profile, candidates)
+    rows = np.arange(len(scores)) if candidates is None else candidates
+    scores[np.isin(book_groups[rows], book_groups[fav_idx])] = -np.inf
+    return scores
+
+@lru_cache(maxsize=1024)
+def encode_query(text):
+    query_emb = model.encode([text])[0]
+    query_emb.setflags(write=False)
+    return query_emb
+
+def keyword_match_indices(query):
+    """Row indices (catalog order) whose title, authors or genres contain query"""
+    query = query.lower().strip()
+    mask = np.fromiter(
+        (query in t or query in a or query in g for t, a, g in zip(title_lc, authors_lc, genres_lc)),
+        dtype=bool, count=len(title_lc),
+    )
+    return np.flatnonzero(mask)
 
 # ---------- Recommendation System ----------
-def get_recommendations(favorite_ids):
-    if not favorite_ids:
-        return pd.DataFrame()
-    
-    fav_embeddings = []
-    valid_fav_ids = []
-    
-    for fav_id in favorite_ids:
-        book_data = df[df['id'] == fav_id]
-        if not book_data.empty:
-            fav_embeddings.append(book_data.iloc[0]['embedding'])
-            valid_fav_ids.append(fav_id)
-    
-    if not fav_embeddings:
-        return pd.DataFrame()
-    
-    avg_fav_embedding = np.mean(fav_embeddings, axis=0).reshape(1, -1)
-    all_embeddings = np.array(df['embedding'].tolist())
-    similarities = cosine_similarity(avg_fav_embedding, all_embeddings)[0]
+def get_recommendations(favorite_ids, candidates=None, mode="blend", profile=None):
+    """ResultCursor over the catalog (or the filtered candidates) for the favorites profile, or None.
 
-    alpha = 0.3 #weight for ratings
+    A stored blend profile can be passed in to skip re-averaging the favorites.
+    """
+    fav_idx = favorite_indices(favorite_ids)
+    if not fav_idx:
+        return None
+    if profile is None or mode != "blend":
+        profile = favorites_profile(fav_idx, mode)
+    scores = favorites_scores(fav_idx, profile, candidates)
+    return ResultCursor(scores, BOOKS_PER_REC, candidates, book_groups)
+
+def stored_favorites(user_token):
+    """(favorite_ids, blend profile) stored under user_token.
+
+    The stored profile is a running sum kept by add/remove, which need the
+    book's vector; a favorite that has since left the catalog can't be taken
+    back out of it, so then the profile is None and gets re-averaged.
+    """
+    favorite_ids, profile = favorites_store.favorites(user_token)
+    if len(favorite_indices(favorite_ids)) != len(favorite_ids):
+        profile = None
+    return favorite_ids, profile
+
+def get_user_recommendations(user_token, candidates=None, mode="blend"):
+    """get_recommendations for the favorites stored under user_token"""
+    favorite_ids, profile = stored_favorites(user_token)
+    if not favorite_ids:
+        return None
+    return get_recommendations(favorite_ids, candidates, mode, profile)
 
-    fin_sim_score = alpha*df['average_rating']+(1-alpha)*similarities
-    
-    sim_df = pd.DataFrame({'id': df['id'], 'sim_score': fin_sim_score})
-    sim_df = sim_df[~sim_df['id'].isin(valid_fav_ids)]
-    top_recs = sim_df.nlargest(BOOKS_PER_REC, 'sim_score')
-    recommendations = pd.merge(top_recs, df, on='id', how='left')
-    
-    return recommendations
+def apply_favorite_event(event_json, recs_mode="blend", recs_state=None):
+    """Apply one add/remove sent by the browser, then refresh the recommendations.
 
-def refresh_recommendations_with_favorites(favorite_ids_js):
+    Placeholders only replace an empty grid; recommendations already on
+    screen stay until the new page is ready.
+    """
     try:
-        if isinstance(favorite_ids_js, str):
-            favorite_ids = json.loads(favorite_ids_js)
-        elif isinstance(favorite_ids_js, (list, tuple)):
-            favorite_ids = list(favorite_ids_js)
-        else:
-            favorite_ids = []
-        
-        favorite_ids = [str(x) for x in favorite_ids if x]
-        
-        if not favorite_ids:
-            return gr.update(value="<div class='no-books'>Add some favorites first!</div>"), pd.DataFrame(), 0, gr.update(visible=False)
-        
-        recommendations = get_recommendations(favorite_ids)
-        if recommendations.empty:
-            return gr.update(value="<div class='no-books'>No recommendations found for your favorites.</div>"), pd.DataFrame(), 0, gr.update(visible=False)
+        event = json.loads(event_json)
+        user_token, book_id = event["token"], str(event["id"])
+        if valid_token(user_token) and book_id in id_to_idx:
+            vector = norm_embeddings[id_to_idx[book_id]]
+            if event["op"] == "add":
+                favorites_store.add(user_token, book_id, vector)
+            elif event["op"] == "remove":
+                favorites_store.remove(user_token, book_id, vector)
+    except (ValueError, KeyError, TypeError):
+        yield gr.update(), gr.update(), gr.update(), gr.update()
+        return
+    yield from refresh_recommendations(user_token, recs_mode, placeholders=recs_state is None)
+
+def restore_favorites(user_token):
+    """Stored favorites with the card data the sidebar needs, as JSON"""
+    if not valid_token(user_token):
+        return "[]"
+    books = df.iloc[favorite_indices(favorites_store.favorite_ids(user_token))]
+    return json.dumps([
+        {"id": book["id"], "title": book["title"], "authors": ", ".join(book["authors"]), "img": f"/covers/book/{book['id']}"}
+        for _, book in books.iterrows()
+    ])
+
+def refresh_recommendations(user_token, recs_mode="blend", placeholders=True):
+    """Stream recommendations: placeholders, then the top few cards, then the full page.
+
+    With placeholders=False only the full page is sent.
+    """
+    try:
+        if not valid_token(user_token) or not favorites_store.favorite_ids(user_token):
+            yield gr.update(value="<div class='no-books'>Add some favorites first!</div>"), None, 0, gr.update(visible=False)
+            return
         
-        first_batch = recommendations.head(BOOKS_PER_LOAD)
-        html = build_books_grid_html(first_batch)
-        has_more = len(recommendations) > BOOKS_PER_LOAD
+        if placeholders:
+            yield build_streaming_grid_html(), gr.update(), gr.update(), gr.update(visible=False)
+        recommendations = get_user_recommendations(user_token, mode=recs_mode)
+        first_batch = recommendations.next_page(BOOKS_PER_LOAD) if recommendations is not None else []
+        if len(first_batch) == 0:
+            yield gr.update(value="<div class='no-books'>No recommendations found for your favorites.</div>"), None, 0, gr.update(visible=False)
+            return
         
-        return html, recommendations, 1, gr.update(visible=has_more)
+        if placeholders and len(first_batch) > STREAM_FIRST_CARDS:
+            yield build_streaming_grid_html(df.iloc[first_batch[:STREAM_FIRST_CARDS]], len(first_batch)), gr.update(), gr.update(), gr.update()
+        html = build_books_grid_html(df.iloc[first_batch])
+        yield html, recommendations, 1, gr.update(visible=recommendations.has_more())
     except Exception as e:
-        return gr.update(value="<div class='no-books'>Error generating recommendations</div>"), pd.DataFrame(), 0, gr.update(visible=False)
+        yield gr.update(value="<div class='no-books'>Error generating recommendations</div>"), None, 0, gr.update(visible=False)
 
 def load_more_recommendations(recs_state, recs_page_state):
-    if recs_state is None or recs_state.empty:
-        return gr.update(), recs_page_state, gr.update(visible=False)
+    if recs_state is None:
+        return gr.update(), recs_state, recs_page_state, gr.update(visible=False)
     
-    start = recs_page_state * BOOKS_PER_LOAD
-    end = start + BOOKS_PER_LOAD
-    new_books = recs_state.iloc[start:end]
-    
-    if new_books.empty:
-        return gr.update(), recs_page_state, gr.update(visible=False)
+    new_books = recs_state.next_page(BOOKS_PER_LOAD)
+    if len(new_books) == 0:
+        return gr.update(), recs_state, recs_page_state, gr.update(visible=False)
     
-    all_loaded = recs_state.iloc[:end]
-    html = build_books_grid_html(all_loaded)
-    has_more = end < len(recs_state)
-    return html, recs_page_state + 1, gr.update(visible=has_more)
+    html = build_books_grid_html(df.iloc[recs_state.served])
+    return html, recs_state, recs_page_state + 1, gr.update(visible=recs_state.has_more())
 
-def semantic_search_books(user_query, semantic_results_state, semantic_page_state):
+def semantic_search_books(user_query, genre_filter, min_rating_filter, semantic_results_state, semantic_page_state):
+    """Stream results: placeholders while the query encodes, then the top few cards, then the full page"""
     if not user_query.strip():
-        return gr.update(), gr.update(visible=False), pd.DataFrame(), pd.DataFrame(), 0, gr.update(visible=False)
+        yield gr.update(), gr.update(visible=False), None, pd.DataFrame(), 0, gr.update(visible=False)
+        return
+
+    yield build_streaming_grid_html(), gr.update(visible=True), gr.update(), gr.update(), gr.update(), gr.update(visible=False)
 
-    user_query = user_query.strip()
-    query_emb = model.encode([user_query])
-    all_embeddings = np.array(df['embedding'].tolist())
-    similarities = cosine_similarity(query_emb, all_embeddings)[0]
-    alpha = 0.3
-    similarities = alpha*df['average_rating'] + (1-alpha)*similarities
+    candidates = filter_index.candidates(genres=genre_filter, min_rating=min_rating_filter or None)
+    query_emb = encode_query(user_query.strip())
+    results = ResultCursor(score_query(query_emb, candidates), BOOKS_PER_REC, candidates, book_groups)
 
-    sim_df = pd.DataFrame({'id': df['id'], 'sim_score': similarities})
-    top_recs = sim_df.nlargest(BOOKS_PER_REC, 'sim_score')
-    recommendations = pd.merge(top_recs, df, on='id', how='left')
+    first_idx = results.next_page(BOOKS_PER_LOAD)
+    if len(first_idx) > STREAM_FIRST_CARDS:
+        yield build_streaming_grid_html(df.iloc[first_idx[:STREAM_FIRST_CARDS]], len(first_idx)), \
+              gr.update(), gr.update(), gr.update(), gr.update(), gr.update()
 
-    first_batch = recommendations.head(BOOKS_PER_LOAD)
+    first_batch = df.iloc[first_idx]
     html = build_books_grid_html(first_batch)
-    has_more = len(recommendations) > BOOKS_PER_LOAD
 
     # FIX: Return the first batch as display_state, not empty DataFrame
-    return html, gr.update(visible=True), recommendations, first_batch, 1, gr.update(visible=has_more)
+    yield html, gr.update(visible=True), results, first_batch, 1, gr.update(visible=results.has_more())
     
-def clear_semantic(random_loaded_state):
-    first_batch = random_loaded_state.head(BOOKS_PER_LOAD)
-    html = build_books_grid_html(first_batch)
-    has_more = len(random_loaded_state) > BOOKS_PER_LOAD
-    return gr.update(value=""), html, gr.update(visible=False), pd.DataFrame(), 0, gr.update(visible=has_more)
+def clear_semantic(random_seed_state, random_page_state):
+    html = feed_html("random", random_seed_state, random_page_state)
+    has_more = random_page_state < FEED_PAGES
+    return gr.update(value=""), html, gr.update(visible=False), None, 0, gr.update(visible=has_more)
 
 
 # ---------- Search Functions ----------
+def suggest_books(query):
+    """Type-ahead list for the keyword search box"""
+    suggestions = suggest_index.suggest(query, limit=8)
+    if not suggestions:
+        return ""
+    items = "".join(
+        f"<div class='suggestion' data-text=\"{html_lib.escape(s['text'])}\">"
+        f"<span class='suggestion-kind'>{'✍️' if s['kind'] == 'author' else '📖'}</span>"
+        f"{html_lib.escape(s['text'])}</div>"
+        for s in suggestions
+    )
+    return f"<div class='suggestions'>{items}</div>"
+
 def search_books(query, search_results_state, search_page_state):
     if not query.strip():
         return gr.update(), gr.update(visible=False), pd.DataFrame(), pd.DataFrame(), 0, gr.update(visible=False)
     
-    query = query.lower().strip()
-    title_mask = df['title'].str.lower().str.contains(query, na=False)
-    author_mask = df['authors'].apply(lambda authors: any(query in author.lower() for author in authors))
-    genre_mask = df['genres'].apply(lambda genres: any(query in genre.lower() for genre in genres))
-    
-    combined_mask = title_mask | author_mask | genre_mask 
-    results = df[combined_mask]
+    results = df.iloc[keyword_match_indices(query)]
     
     first_batch = results.head(BOOKS_PER_LOAD)
     html = build_books_grid_html(first_batch)
@@ -194,29 +463,13 @@ def load_more_search(search_results_state, search_page_state):
     has_more = end < len(search_results_state)
     return html, search_page_state + 1, gr.update(visible=has_more)
 
-def clear_search(random_loaded_state):
-    first_batch = random_loaded_state.head(BOOKS_PER_LOAD)
-    html = build_books_grid_html(first_batch)
-    has_more = len(random_loaded_state) > BOOKS_PER_LOAD
+def clear_search(random_seed_state, random_page_state):
+    html = feed_html("random", random_seed_state, random_page_state)
+    has_more = random_page_state < FEED_PAGES
     return gr.update(value=""), html, gr.update(visible=False), pd.DataFrame(), 0, gr.update(visible=has_more)
 
 # ---------- Load More Logic ----------
-def load_more(loaded_books, display_books, page_idx):
-    start = page_idx * BOOKS_PER_LOAD
-    end = start + BOOKS_PER_LOAD
-    new_books = loaded_books.iloc[start:end]
-    if display_books is None or display_books.empty:
-        display_books = pd.DataFrame()
-    if new_books.empty:
-        combined = display_books
-        html = build_books_grid_html(combined)
-        return combined, gr.update(value=html), page_idx, gr.update(visible=False)
-    combined = pd.concat([display_books, new_books], ignore_index=True)
-    html = build_books_grid_html(combined)
-    has_more = end < len(loaded_books)
-    return combined, gr.update(value=html), page_idx + 1, gr.update(visible=has_more)
-
-def load_more_combined(random_loaded_state, random_display_state, random_page_state,
+def load_more_combined(random_seed_state, random_page_state,
                        search_results_state, search_display_state, search_page_state,
                        semantic_results_state, semantic_display_state, semantic_page_state):
     """
@@ -225,16 +478,14 @@ def load_more_combined(random_loaded_state, random_display_state, random_page_st
     """
 
     # ---------- SEMANTIC SEARCH ----------
-    if semantic_results_state is not None and not semantic_results_state.empty:
-        start = semantic_page_state * BOOKS_PER_LOAD
-        end = start + BOOKS_PER_LOAD
-        new_books = semantic_results_state.iloc[start:end]
+    if semantic_results_state is not None:
+        new_books = df.iloc[semantic_results_state.next_page(BOOKS_PER_LOAD)]
 
         # If no new books to load, return current state
         if new_books.empty:
             html = build_books_grid_html(semantic_display_state)
-            return html, random_display_state, random_page_state, gr.update(visible=False), \
-                   search_display_state, search_page_state, semantic_display_state, semantic_page_state
+            return html, random_page_state, gr.update(visible=False), \
+                   search_display_state, search_page_state, semantic_display_state, semantic_page_state, semantic_results_state
 
         # Append new books to existing display
         if semantic_display_state is None or semantic_display_state.empty:
@@ -243,9 +494,9 @@ def load_more_combined(random_loaded_state, random_display_state, random_page_st
             combined = pd.concat([semantic_display_state, new_books], ignore_index=True)
         
         html = build_books_grid_html(combined)
-        has_more = end < len(semantic_results_state)
-        return html, random_display_state, random_page_state, gr.update(visible=has_more), \
-               search_display_state, search_page_state, combined, semantic_page_state + 1
+        has_more = semantic_results_state.has_more()
+        return html, random_page_state, gr.update(visible=has_more), \
+               search_display_state, search_page_state, combined, semantic_page_state + 1, semantic_results_state
 
     # ---------- KEYWORD SEARCH ----------
     elif search_results_state is not None and not search_results_state.empty:
@@ -255,8 +506,8 @@ def load_more_combined(random_loaded_state, random_display_state, random_page_st
 
         if new_books.empty:
             html = build_books_grid_html(search_display_state)
-            return html, random_display_state, random_page_state, gr.update(visible=False), \
-                   search_display_state, search_page_state, semantic_display_state, semantic_page_state
+            return html, random_page_state, gr.update(visible=False), \
+                   search_display_state, search_page_state, semantic_display_state, semantic_page_state, semantic_results_state
 
         # Append new books to existing display
         if search_display_state is None or search_display_state.empty:
@@ -266,33 +517,15 @@ def load_more_combined(random_loaded_state, random_display_state, random_page_st
         
         html = build_books_grid_html(combined)
         has_more = end < len(search_results_state)
-        return html, random_display_state, random_page_state, gr.update(visible=has_more), \
-               combined, search_page_state + 1, semantic_display_state, semantic_page_state
+        return html, random_page_state, gr.update(visible=has_more), \
+               combined, search_page_state + 1, semantic_display_state, semantic_page_state, semantic_results_state
 
     # ---------- RANDOM BOOKS ----------
     else:
-        start = random_page_state * BOOKS_PER_LOAD
-        end = start + BOOKS_PER_LOAD
-        new_books = random_loaded_state.iloc[start:end]
-
-        if new_books.empty:
-            html = build_books_grid_html(random_display_state)
-            return html, random_display_state, random_page_state, gr.update(visible=False), \
-                   search_display_state, search_page_state, semantic_display_state, semantic_page_state
-
-        # Append new books to existing display
-        if random_display_state is None or random_display_state.empty:
-            combined = new_books
-        else:
-            combined = pd.concat([random_display_state, new_books], ignore_index=True)
-        
-        html = build_books_grid_html(combined)
-        has_more = end < len(random_loaded_state)
-        return html, combined, random_page_state + 1, gr.update(visible=has_more), \
-               search_display_state, search_page_state, semantic_display_state, semantic_page_state
-
-def initial_load(loaded_books):
-    return load_more(loaded_books, pd.DataFrame(), 0)
+        pages = min(random_page_state + 1, FEED_PAGES)
+        html = feed_html("random", random_seed_state, pages)
+        return html, pages, gr.update(visible=pages < FEED_PAGES), \
+               search_display_state, search_page_state, semantic_display_state, semantic_page_state, semantic_results_state
 
 # ---------- Gradio UI ----------
 with gr.Blocks(css="""
@@ -572,6 +805,35 @@ with gr.Blocks(css="""
     background: #666; 
 }
 
+.suggestions {
+    background: #1c1c22;
+    border: 1px solid #2a2a2a;
+    border-radius: 6px;
+    margin-top: 4px;
+    max-height: 260px;
+    overflow-y: auto;
+}
+
+.suggestion {
+    padding: 6px 12px;
+    cursor: pointer;
+    font-size: 13px;
+    color: #eaeaea;
+}
+
+.suggestion:hover {
+    background: #667eea;
+}
+
+.suggestion-kind {
+    margin-right: 8px;
+}
+
+/* set by the page script after a search; only typing opens the list again */
+.suggestions-closed .suggestions {
+    display: none;
+}
+
 /* Mobile adjustments for search */
 @media (max-width: 768px) {
     .search-row {
@@ -591,6 +853,13 @@ with gr.Blocks(css="""
 }
 
 .no-books { text-align:center; color:#9ba1b0; font-style:italic; padding:40px; font-size:16px; }
+
+/* ---------- Streaming placeholders ---------- */
+@keyframes skeleton-pulse { 0% { opacity:0.5; } 50% { opacity:1; } 100% { opacity:0.5; } }
+.skeleton-card { padding:12px; border-radius:12px; background:#1b1b1e; border:1px solid #2d2d2d; animation:skeleton-pulse 1.4s ease-in-out infinite; }
+.skeleton-cover { width:100%; height:200px; border-radius:8px; background:#2a2a33; }
+.skeleton-line { height:12px; margin-top:8px; border-radius:4px; background:#2a2a33; }
+.skeleton-line.short { width:60%; }
 """) as demo:
 
     with gr.Column(elem_classes="main-content"):
@@ -606,9 +875,11 @@ with gr.Blocks(css="""
                     placeholder="Search by title, author, or genre...",
                     show_label=False,
                     elem_classes="search-input",
+                    elem_id="search-input",
                     scale=8  # Takes more space
                 )
-                search_btn = gr.Button("Search", elem_classes="search-btn", size="sm", scale=2)  # Takes less space
+                search_btn = gr.Button("Search", elem_classes="search-btn", elem_id="search-btn", size="sm", scale=2)  # Takes less space
+            suggestions_container = gr.HTML(elem_id="search-suggestions")
             
             clear_search_btn = gr.Button("Clear Search", elem_classes="clear-search", visible=False)
 
@@ -624,6 +895,14 @@ with gr.Blocks(css="""
                     scale = 8
                 )
                 semantic_btn = gr.Button("✨ Find Books", elem_classes="search-btn")
+            with gr.Row(elem_classes="search-row"):
+                genre_filter = gr.Dropdown(
+                    choices=filter_index.genres,
+                    multiselect=True,
+                    label="Only these genres",
+                    scale=3,
+                )
+                min_rating_filter = gr.Slider(0, 5, value=0, step=0.5, label="Minimum rating", scale=2)
             clear_semantic_btn = gr.Button("Clear", elem_classes="clear-search", visible=False)
 
     
@@ -633,8 +912,7 @@ with gr.Blocks(css="""
                 gr.Markdown("🎲 Random Books")
                 shuffle_btn = gr.Button("🔀 Shuffle", elem_classes="shuffle-btn")
             
-            random_loaded_state = gr.State(df.sample(frac=1).reset_index(drop=True))
-            random_display_state = gr.State(pd.DataFrame())
+            random_seed_state = gr.State(0)
             random_page_state = gr.State(0)
             
             search_results_state = gr.State(pd.DataFrame())
@@ -642,7 +920,7 @@ with gr.Blocks(css="""
 
             search_page_state = gr.State(0)
 
-            semantic_results_state = gr.State(pd.DataFrame())
+            semantic_results_state = gr.State(None)
             semantic_page_state = gr.State(0)
             semantic_display_state = gr.State(pd.DataFrame())
 
@@ -654,8 +932,6 @@ with gr.Blocks(css="""
     
         # ---------- POPULAR BOOKS SECTION ----------
         gr.Markdown("🌟 Popular Books", elem_classes="section-header")
-        popular_loaded_state = gr.State(df.head(len(df)))
-        popular_display_state = gr.State(pd.DataFrame())
         popular_page_state = gr.State(0)
     
         with gr.Column(elem_classes="scroll-section"):
@@ -664,12 +940,21 @@ with gr.Blocks(css="""
 
         # ---------- RECOMMENDATIONS SECTION ----------
         gr.Markdown("💫 Recommended For You", elem_classes="section-header")
-        recs_state = gr.State(pd.DataFrame())
+        recs_state = gr.State(None)
         recs_page_state = gr.State(0)
-        favorite_ids_input = gr.Textbox(visible=False, elem_id="favorite-ids-input")
+        user_token_input = gr.Textbox(visible=False, elem_id="user-token-input")
+        # "hidden" rather than False: the page script writes favorite events into
+        # this textbox, and visible=False components are not rendered at all
+        favorite_event_input = gr.Textbox(visible="hidden", elem_id="favorite-event-input")
+        favorites_restore = gr.Textbox(visible=False)
 
         with gr.Column(elem_classes="scroll-section"):
             recs_container = gr.HTML("<div class='no-books'>Add some favorites to get recommendations!</div>")
+            recs_mode = gr.Radio(
+                choices=[("Blend all favorites", "blend"), ("Multi-interest", "multi")],
+                value="blend",
+                show_label=False,
+            )
             with gr.Row(elem_classes="refresh-row"):
                 refresh_recs_btn = gr.Button("🔄 Refresh Recommendations", elem_classes="load-more-btn")
                 recs_load_btn = gr.Button("📚 Load More Recommendations", elem_classes="load-more-btn", visible=False)
@@ -678,33 +963,38 @@ with gr.Blocks(css="""
         random_load_btn.click(
             load_more_combined,
             [
-                random_loaded_state, random_display_state, random_page_state,
+                random_seed_state, random_page_state,
                 search_results_state, search_display_state, search_page_state,
                 semantic_results_state, semantic_display_state, semantic_page_state
             ],
             [
-                random_container, random_display_state, random_page_state, random_load_btn,
+                random_container, random_page_state, random_load_btn,
                 search_display_state, search_page_state,
-                semantic_display_state, semantic_page_state
-            ]
+                semantic_display_state, semantic_page_state, semantic_results_state
+            ],
+            api_name="load_more",
         )
 
         
         shuffle_btn.click(
             shuffle_random_books,
-            outputs=[random_loaded_state, random_container, random_display_state, random_page_state, random_load_btn]
+            [random_seed_state],
+            [random_seed_state, random_container, random_page_state, random_load_btn],
+            api_name="shuffle",
         )
         
         popular_load_btn.click(
-            load_more,
-            [popular_loaded_state, popular_display_state, popular_page_state],
-            [popular_display_state, popular_container, popular_page_state, popular_load_btn]
+            load_more_popular,
+            [popular_page_state],
+            [popular_container, popular_page_state, popular_load_btn],
+            api_name="load_more_popular",
         )
 
         search_btn.click(
             search_books,
             [search_input, search_results_state, search_page_state],
-            [random_container, clear_search_btn, search_results_state, search_display_state, search_page_state, random_load_btn]  # Added search_display_state
+            [random_container, clear_search_btn, search_results_state, search_display_state, search_page_state, random_load_btn],  # Added search_display_state
+            api_name="keyword_search",
         )
         
         search_input.submit(
@@ -713,57 +1003,92 @@ with gr.Blocks(css="""
             [random_container, clear_search_btn, search_results_state, search_display_state, search_page_state, random_load_btn]  # Added search_display_state
         )
 
+        search_input.input(
+            suggest_books,
+            [search_input],
+            [suggestions_container],
+            trigger_mode="always_last",
+            show_progress="hidden",
+            queue=False,
+        )
+        search_btn.click(lambda: "", outputs=[suggestions_container], queue=False)
+        search_input.submit(lambda: "", outputs=[suggestions_container], queue=False)
+
         clear_search_btn.click(
             clear_search,
-            [random_loaded_state],
+            [random_seed_state, random_page_state],
             [search_input, random_container, clear_search_btn, search_results_state, search_page_state, random_load_btn]
         )
 
         recs_load_btn.click(
             load_more_recommendations,
             [recs_state, recs_page_state],
-            [recs_container, recs_page_state, recs_load_btn]
+            [recs_container, recs_state, recs_page_state, recs_load_btn],
+            api_name="load_more_recommendations",
         )
         
         refresh_recs_btn.click(
-            None,
-            js="() => getFavoritesFromJS()",
-            outputs=[favorite_ids_input],
+            refresh_recommendations,
+            [user_token_input, recs_mode],
+            [recs_container, recs_state, recs_page_state, recs_load_btn],
+            api_name="refresh_recommendations",
         )
         
-        favorite_ids_input.change(
-            refresh_recommendations_with_favorites,
-            [favorite_ids_input],
+        # every add/remove is a separate event, so none may be merged away
+        # ("always_last" would drop clicks made while a refresh is running);
+        # the queue runs them one at a time, in order
+        favorite_event_input.change(
+            apply_favorite_event,
+            [favorite_event_input, recs_mode, recs_state],
+            [recs_container, recs_state, recs_page_state, recs_load_btn],
+            api_name="favorite_event",
+            trigger_mode="multiple",
+            queue=True,
+        )
+
+        recs_mode.change(
+            refresh_recommendations,
+            [user_token_input, recs_mode],
+            [recs_container, recs_state, recs_page_state, recs_load_btn],
+        )
+
+        # the browser keeps an anonymous token; favorites and their profile live server side
+        demo.load(None, js="() => getUserToken()", outputs=[user_token_input])
+        user_token_input.change(
+            restore_favorites, [user_token_input], [favorites_restore]
+        ).then(
+            refresh_recommendations,
+            [user_token_input, recs_mode],
             [recs_container, recs_state, recs_page_state, recs_load_btn],
         )
+        favorites_restore.change(None, [favorites_restore], None, js="(data) => restoreFavorites(data)")
 
         semantic_btn.click(
             semantic_search_books,
-            [semantic_input, semantic_results_state, semantic_page_state],
-            [random_container, clear_semantic_btn, semantic_results_state, semantic_display_state, semantic_page_state, random_load_btn]  # Added semantic_display_state
+            [semantic_input, genre_filter, min_rating_filter, semantic_results_state, semantic_page_state],
+            [random_container, clear_semantic_btn, semantic_results_state, semantic_display_state, semantic_page_state, random_load_btn],  # Added semantic_display_state
+            api_name="semantic_search",
         )
         
         semantic_input.submit(
             semantic_search_books,
-            [semantic_input, semantic_results_state, semantic_page_state],
+            [semantic_input, genre_filter, min_rating_filter, semantic_results_state, semantic_page_state],
             [random_container, clear_semantic_btn, semantic_results_state, semantic_display_state, semantic_page_state, random_load_btn]  # Added semantic_display_state
         )
         clear_semantic_btn.click(
             clear_semantic,
-            [random_loaded_state],
+            [random_seed_state, random_page_state],
             [semantic_input, random_container, clear_semantic_btn, semantic_results_state, semantic_page_state, random_load_btn]
         )
 
         # ---------- INITIAL LOAD ----------
         demo.load(
-            lambda: [
-                *initial_load(random_loaded_state.value),
-                *initial_load(popular_loaded_state.value)
-            ],
+            initial_feeds,
             outputs=[
-                random_display_state, random_container, random_page_state, random_load_btn,
-                popular_display_state, popular_container, popular_page_state, popular_load_btn
-            ]
+                random_seed_state, random_container, random_page_state, random_load_btn,
+                popular_container, popular_page_state, popular_load_btn
+            ],
+            api_name="initial_feeds",
         )
 
         with gr.Column(elem_classes="sidebar"):
@@ -792,15 +1117,39 @@ function escapeHtml(str){
     .replace(/"/g,'&quot;').replace(/'/g,'&#39;') : "";
 }
 
-function syncFavoritesToPython() {
-    const favoriteIds = Array.from(favorites.keys());
-    const hiddenInput = document.getElementById('favorite-ids-input');
+function getUserToken() {
+    let token = localStorage.getItem('bookrec-token');
+    if (!token) {
+        token = crypto.randomUUID();
+        localStorage.setItem('bookrec-token', token);
+    }
+    return token;
+}
+window.getUserToken = getUserToken;
+
+// Send only the change; the server keeps the favorite set and profile.
+let favoriteEventSeq = 0;
+function sendFavoriteEvent(op, id) {
+    const hiddenInput = document.querySelector('#favorite-event-input textarea, #favorite-event-input input');
     if (hiddenInput) {
-        hiddenInput.value = JSON.stringify(favoriteIds);
+        hiddenInput.value = JSON.stringify({ token: getUserToken(), op, id, seq: ++favoriteEventSeq });
         hiddenInput.dispatchEvent(new Event('input', { bubbles: true }));
     }
 }
 
+function restoreFavorites(data) {
+    let books = [];
+    try { books = JSON.parse(data || "[]"); } catch (e) { return; }
+    favorites.clear();
+    books.forEach(book => {
+        favorites.set(String(book.id), { title: book.title, authors: book.authors, img: book.img });
+        const cardBtn = document.querySelector(`.book-card[data-id="${book.id}"] .fav-btn`);
+        if (cardBtn) cardBtn.classList.add('fav-active');
+    });
+    updateFavoritesSidebar();
+}
+window.restoreFavorites = restoreFavorites;
+
 function updateFavoritesSidebar(){
   const sidebarList = document.getElementById('favorites-list');
   if(!sidebarList) return;
@@ -824,14 +1173,7 @@ function updateFavoritesSidebar(){
       </div>`;
   });
   sidebarList.innerHTML = html;
-  syncFavoritesToPython();
-}
-
-function getFavoritesFromJS() {
-  const ids = Array.from(favorites.keys());
-  return JSON.stringify(ids);
 }
-window.getFavoritesFromJS = getFavoritesFromJS;
 
 // Mobile favorites toggle --------------------------------
 function toggleFavorites() {
@@ -878,15 +1220,49 @@ function checkScreenSize() {
 window.addEventListener('resize', checkScreenSize);
 setTimeout(checkScreenSize, 100);
 
+// Suggestions ------------------------------
+// A suggest request still in flight when a search starts would reopen the
+// list, so after a search it stays hidden until the user types again. The
+// synthetic input event below (needed for Gradio to see the new value) is
+// not trusted, so it does not count as typing.
+function setSuggestionsClosed(closed) {
+    const container = document.getElementById('search-suggestions');
+    if (container) container.classList.toggle('suggestions-closed', closed);
+}
+
+document.addEventListener('input', e => {
+    if (e.isTrusted && e.target.closest('#search-input')) setSuggestionsClosed(false);
+}, true);
+
+document.addEventListener('keydown', e => {
+    if (e.key === 'Enter' && e.target.closest('#search-input')) setSuggestionsClosed(true);
+}, true);
+
 // ------------------------------
 
 document.addEventListener('click', e=>{
+  if(e.target.closest('#search-btn')) setSuggestionsClosed(true);
+
+  const suggestion = e.target.closest('.suggestion');
+  if(suggestion){
+    setSuggestionsClosed(true);
+    const input = document.querySelector('#search-input textarea, #search-input input');
+    if(input){
+      input.value = suggestion.dataset.text;
+      input.dispatchEvent(new Event('input', { bubbles: true }));
+    }
+    const searchBtn = document.getElementById('search-btn');
+    if(searchBtn) searchBtn.click();
+    return;
+  }
+
   if(e.target.closest('.remove-fav-btn')){
     const parent = e.target.closest('.sidebar-book');
     if(!parent) return;
     const id = parent.dataset.id;
     favorites.delete(id);
     updateFavoritesSidebar();
+    sendFavoriteEvent('remove', id);
     const cardBtn = document.querySelector(`.book-card[data-id="${id}"] .fav-btn`);
     if(cardBtn) cardBtn.classList.remove('fav-active');
     return;
@@ -903,9 +1279,11 @@ document.addEventListener('click', e=>{
     if(favorites.has(bookId)){
       favorites.delete(bookId);
       favBtn.classList.remove('fav-active');
+      sendFavoriteEvent('remove', bookId);
     } else {
       favorites.set(bookId,{title,authors,img});
       favBtn.classList.add('fav-active');
+      sendFavoriteEvent('add', bookId);
     }
     updateFavoritesSidebar();
     return;
@@ -947,4 +1325,210 @@ document.addEventListener('keydown',e=>{if(e.key==='Escape') overlay.style.displ
 </script>
 """)
 
-demo.launch()
\ No newline at end of file
+# ---------- JSON API ----------
+# Headless routes for other services: ids and scores only, no DataFrame
+# merges and no card HTML. Cursors are opaque to callers; they carry the
+# query and offset so any worker can serve the next page.
+api = FastAPI(title="Library Explorer API")
+
+class RecommendationsRequest(BaseModel):
+    favorite_ids: list[str] = []
+    user_token: str | None = None
+    limit: int = Field(BOOKS_PER_LOAD, ge=1, le=MAX_API_LIMIT)
+    cursor: str | None = None
+    mode: Literal["blend", "multi"] = "blend"
+    genres: list[str] | None = None
+    authors: list[str] | None = None
+    min_rating: float | None = None
+    min_ratings_count: int | None = None
+
+def encode_cursor(payload):
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def is_str_list(value):
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+def is_number(value, integer=False):
+    # bool is an int subclass, but never a valid offset or threshold
+    return isinstance(value, int if integer else (int, float)) and not isinstance(value, bool)
+
+FILTER_CHECKS = {
+    "genres": is_str_list,
+    "authors": is_str_list,
+    "min_rating": is_number,
+    "min_ratings_count": lambda v: is_number(v, integer=True),
+}
+
+def valid_cursor_payload(payload, kind):
+    """Whether a decoded cursor has every field its kind reads, with the right types"""
+    if not isinstance(payload, dict) or payload.get("k") != kind:
+        return False
+    if not is_number(payload.get("o"), integer=True) or payload["o"] < 0:
+        return False
+    filters = payload.get("fl", {})
+    if not isinstance(filters, dict) or not all(
+        name in FILTER_CHECKS and FILTER_CHECKS[name](value) for name, value in filters.items()
+    ):
+        return False
+    if kind == "recs":
+        if payload.get("m", "blend") not in ("blend", "multi"):
+            return False
+        if "u" in payload:
+            return "f" not in payload and valid_token(payload["u"])
+        return is_str_list(payload.get("f"))
+    return isinstance(payload.get("q"), str) and bool(payload["q"].strip())
+
+def decode_cursor(cursor, kind):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        payload = None
+    if not valid_cursor_payload(payload, kind):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return payload
+
+def filter_payload(genres=None, authors=None, min_rating=None, min_ratings_count=None):
+    """Filters worth carrying in a cursor; unset ones are dropped"""
+    filters = {
+        "genres": genres, "authors": authors,
+        "min_rating": min_rating, "min_ratings_count": min_ratings_count,
+    }
+    return {name: value for name, value in filters.items() if value is not None and value != []}
+
+def payload_candidates(payload):
+    return filter_index.candidates(**payload.get("fl", {}))
+
+def ranked_page(scores, payload, limit, candidates=None):
+    offset = payload["o"]
+    top = top_k_collapsed(scores, offset + limit + 1, candidates)
+    page = top[offset:offset + limit]
+    rows = page if candidates is None else candidates[page]
+    next_cursor = encode_cursor({**payload, "o": offset + limit}) if len(top) > offset + limit else None
+    return {
+        "results": [{"id": book_ids[r], "score": float(scores[i])} for r, i in zip(rows, page)],
+        "next_cursor": next_cursor,
+    }
+
+def recommendations_page(payload, limit):
+    mode = payload.get("m", "blend")
+    if "u" in payload:
+        favorite_ids, profile = stored_favorites(payload["u"])
+        fav_idx = favorite_indices(favorite_ids)
+        if mode != "blend":
+            profile = None
+    else:
+        fav_idx = favorite_indices(payload["f"])
+        profile = None
+    if not fav_idx:
+        return {"results": [], "next_cursor": None}
+    candidates = payload_candidates(payload)
+    if profile is None:
+        profile = favorites_profile(fav_idx, mode)
+    return ranked_page(favorites_scores(fav_idx, profile, candidates), payload, limit, candidates)
+
+def semantic_page(payload, limit):
+    candidates = payload_candidates(payload)
+    return ranked_page(score_query(encode_query(payload["q"]), candidates), payload, limit, candidates)
+
+def keyword_page(payload, limit):
+    offset = payload["o"]
+    matches = keyword_match_indices(payload["q"])
+    page = matches[offset:offset + limit]
+    next_cursor = encode_cursor({**payload, "o": offset + limit}) if len(matches) > offset + limit else None
+    return {
+        "results": [{"id": book_ids[i], "score": 1.0} for i in page],
+        "next_cursor": next_cursor,
+    }
+
+def query_payload(kind, q, cursor, filters=None):
+    if cursor:
+        return decode_cursor(cursor, kind)
+    if not q or not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    payload = {"k": kind, "q": q.strip(), "o": 0}
+    if filters:
+        payload["fl"] = filters
+    return payload
+
+@api.post("/v1/recommendations")
+async def api_recommendations(request: RecommendationsRequest):
+    if request.cursor:
+        payload = decode_cursor(request.cursor, "recs")
+    else:
+        payload = {"k": "recs", "o": 0, "m": request.mode}
+        if request.user_token is not None:
+            if not valid_token(request.user_token):
+                raise HTTPException(status_code=400, detail="Invalid user token")
+            payload["u"] = request.user_token
+        else:
+            payload["f"] = [str(x) for x in request.favorite_ids if x]
+        filters = filter_payload(request.genres, request.authors, request.min_rating, request.min_ratings_count)
+        if filters:
+            payload["fl"] = filters
+    return await run_in_threadpool(recommendations_page, payload, request.limit)
+
+@api.get("/v1/search/semantic")
+async def api_semantic_search(
+    q: str | None = None,
+    limit: int = Query(BOOKS_PER_LOAD, ge=1, le=MAX_API_LIMIT),
+    cursor: str | None = None,
+    genre: list[str] | None = Query(None),
+    author: list[str] | None = Query(None),
+    min_rating: float | None = None,
+    min_ratings_count: int | None = None,
+):
+    filters = filter_payload(genre, author, min_rating, min_ratings_count)
+    payload = query_payload("semantic", q, cursor, filters)
+    return await run_in_threadpool(semantic_page, payload, limit)
+
+@api.get("/v1/suggest")
+async def api_suggest(q: str = "", limit: int = Query(8, ge=1, le=suggest_index.limit)):
+    # cheap enough to answer on the event loop without a threadpool hop
+    return {"suggestions": suggest_index.suggest(q, limit)}
+
+@api.get("/v1/search/keyword")
+async def api_keyword_search(
+    q: str | None = None,
+    limit: int = Query(BOOKS_PER_LOAD, ge=1, le=MAX_API_LIMIT),
+    cursor: str | None = None,
+):
+    payload = query_payload("keyword", q, cursor)
+    return await run_in_threadpool(keyword_page, payload, limit)
+
+# ---------- Covers ----------
+IMMUTABLE = "public, max-age=31536000, immutable"
+PLACEHOLDER_SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="150" height="200" viewBox="0 0 150 200">
+<rect width="150" height="200" fill="#667eea"/>
+<text x="75" y="105" fill="white" font-family="sans-serif" font-size="14" text-anchor="middle">No Image</text>
+</svg>"""
+
+@api.get("/covers/placeholder.svg")
+async def cover_placeholder():
+    return Response(PLACEHOLDER_SVG, media_type="image/svg+xml", headers={"Cache-Control": IMMUTABLE})
+
+@api.get("/covers/book/{book_id}")
+async def cover_for_book(book_id: str):
+    """Redirect to the cached thumbnail, fetching it first on a miss"""
+    if book_id not in id_to_idx:
+        raise HTTPException(status_code=404, detail="Unknown book")
+    url = df.iloc[id_to_idx[book_id]]["image_url"]
+    url = url if isinstance(url, str) else ""
+    known, name = thumbnail_cache.lookup(url)
+    if not known:
+        name = await asyncio.get_running_loop().run_in_executor(cover_executor, thumbnail_cache.thumbnail, url)
+    target = f"/covers/{name}" if name else "/covers/placeholder.svg"
+    # short-lived: the book -> thumbnail mapping may change, the thumbnail itself never does
+    return RedirectResponse(target, status_code=302, headers={"Cache-Control": "public, max-age=86400"})
+
+@api.get("/covers/{name}")
+async def cover_file(name: str):
+    path = thumbnail_cache.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Unknown cover")
+    return FileResponse(path, media_type="image/jpeg", headers={"Cache-Control": IMMUTABLE})
+
+app = gr.mount_gradio_app(api, demo, path="/")
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=os.environ.get("HOST", "0.0.0.0"), port=int(os.environ.get("PORT", 7860)))
@@ -0,0 +1,146 @@
+"""Catalog loading and the shared read-only catalog used by multiple app workers.
+
+One loader process builds the numeric catalog arrays and publishes them as
+.npy files in a directory (ideally on tmpfs such as /dev/shm). Workers started
+with BOOKREC_SHARED_DIR pointing at that directory memory-map the files
+read-only instead of building their own copies, so the embedding matrix lives
+in the page cache once no matter how many workers attach.
+
+    python catalog.py publish /dev/shm/bookrec
+    BOOKREC_SHARED_DIR=/dev/shm/bookrec gunicorn app:app --preload -w 4 -k uvicorn.workers.UvicornWorker
+
+--preload imports app.py once and forks the workers afterwards, so the
+sentence-transformer weights (about 420 MB, the largest per-process cost)
+are shared copy-on-write as well; `uvicorn --workers` would load a copy in
+every worker. Gradio's queue and gr.State live in the process that served a
+session, so with several workers the UI needs sticky routing (every request
+of a browser session to the same worker, e.g. hashing on a cookie in the
+proxy). The JSON API keeps nothing between requests and can go to any worker.
+"""
+import ast
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import suggest_index
+
+CATALOG_CSV = "data_mini_books_update.csv"
+EMBEDDINGS_NPY = "book_embeddings.npy"
+CATALOG_FORMAT = 2  # bump when the published arrays change, so old versions are not attached
+SHARED_ARRAYS = (
+    "norm_embeddings", "avg_ratings", "ratings_counts", "popularity", "popular_order",
+) + suggest_index.ARRAY_NAMES
+
+
+def read_catalog(path=CATALOG_CSV):
+    df = pd.read_csv(path)
+    if "id" not in df.columns:
+        df["id"] = df.index.astype(str)
+    df["authors"] = df["authors"].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+    df["genres"] = df["genres"].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+    return df
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def catalog_version(df, embeddings_path=EMBEDDINGS_NPY):
+    """Short hash of the catalog rows and the embeddings file, so caches never mix two catalogs"""
+    rows = pd.util.hash_pandas_object(df[["id", "title", "average_rating", "ratings_count"]], index=False)
+    digest = hashlib.sha1(rows.to_numpy().tobytes())
+    digest.update(file_digest(embeddings_path))
+    digest.update(str(CATALOG_FORMAT).encode())
+    return digest.hexdigest()[:12]
+
+
+def min_max(values):
+    values = values.astype(np.float64)
+    span = values.max() - values.min()
+    return (values - values.min()) / span if span else np.zeros_like(values)
+
+
+def build_arrays(df, embeddings):
+    """The numeric arrays the app scores, ranks and suggests with"""
+    avg_ratings = df["average_rating"].to_numpy(dtype=np.float32)
+    ratings_counts = df["ratings_count"].to_numpy()
+    # popularity as defined in the notebook: min-max scaled rating and ratings count
+    popularity = 0.5 * min_max(avg_ratings) + 0.5 * min_max(ratings_counts)
+    # unit-length rows, so a dot product with a unit query is the cosine similarity
+    norms = np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    return {
+        "norm_embeddings": (embeddings / norms).astype(np.float32),
+        "avg_ratings": avg_ratings,
+        "ratings_counts": ratings_counts,
+        "popularity": popularity,
+        "popular_order": np.argsort(-popularity, kind="stable"),
+        **suggest_index.build_arrays(df["title"], df["authors"], ratings_counts),
+    }
+
+
+def publish(directory, arrays, version):
+    """Write arrays under directory/<version> and point directory/current at it.
+
+    A version directory is never written in place: live workers may have its
+    files memory-mapped, and truncating them would hand those workers garbage
+    or SIGBUS. A new version is written to a temporary directory and renamed
+    into place; an already published version is reused as is.
+    """
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, version)
+    if not os.path.exists(os.path.join(target, "manifest.json")):
+        staging = tempfile.mkdtemp(dir=directory, prefix=f".{version}-")
+        for name in SHARED_ARRAYS:
+            np.save(os.path.join(staging, name + ".npy"), np.ascontiguousarray(arrays[name]))
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump({"version": version, "rows": len(arrays["avg_ratings"])}, f)
+        # mkdtemp/mkstemp are private to the loader; workers may run as another user
+        for name in os.listdir(staging):
+            os.chmod(os.path.join(staging, name), 0o644)
+        os.chmod(staging, 0o755)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # another publisher got there first; its copy is identical
+            shutil.rmtree(staging)
+            if not os.path.exists(os.path.join(target, "manifest.json")):
+                raise
+
+    # swap the pointer atomically so attaching workers never see a half-written catalog
+    fd, tmp = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, "w") as f:
+        f.write(version)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, os.path.join(directory, "current"))
+    return target
+
+
+def attach(directory, expected_version):
+    """Memory-map the published arrays read-only"""
+    with open(os.path.join(directory, "current")) as f:
+        version = f.read().strip()
+    if version != expected_version:
+        raise RuntimeError(
+            f"Shared catalog in {directory} is version {version}, "
+            f"but this worker loaded {expected_version}; re-run `python catalog.py publish {directory}`"
+        )
+    target = os.path.join(directory, version)
+    return {name: np.load(os.path.join(target, name + ".npy"), mmap_mode="r") for name in SHARED_ARRAYS}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "publish":
+        sys.exit("usage: python catalog.py publish <directory>")
+    df = read_catalog()
+    version = catalog_version(df)
+    print(publish(sys.argv[2], build_arrays(df, np.load(EMBEDDINGS_NPY)), version))
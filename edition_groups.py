@@ -0,0 +1,104 @@
+"""Offline pass that groups editions, box sets and other near-duplicates.
+
+Candidate pairs come from locality-sensitive hashing with random hyperplanes:
+books whose embeddings fall on the same side of every hyperplane in a table
+share a bucket, so only books within a bucket are ever compared instead of all
+n^2 pairs. A pair is merged when the books share an author and either their
+embeddings are nearly identical or their normalized title keys match.
+
+    python edition_groups.py   # writes edition_groups.npz next to the catalog
+"""
+import re
+import sys
+
+import numpy as np
+
+from suggest_index import normalize
+
+GROUPS_NPZ = "edition_groups.npz"
+LSH_BITS = 16  # hyperplanes per table; more bits means smaller buckets
+LSH_TABLES = 12  # independent tables; more tables means fewer missed pairs
+MAX_BUCKET = 64  # buckets bigger than this are generic, not one work's editions
+SIM_THRESHOLD = 0.92
+
+EDITION_WORDS = {
+    "edition", "editions", "box", "boxed", "set", "collection", "complete", "collected",
+    "illustrated", "anniversary", "deluxe", "special", "omnibus", "volume", "vol", "books",
+}
+
+
+def title_key(title):
+    """Title with series info in parentheses and edition words dropped; "" for a missing title"""
+    if not isinstance(title, str):
+        return ""
+    title = re.sub(r"\([^)]*\)", " ", title)
+    return " ".join(w for w in normalize(title).split() if w not in EDITION_WORDS)
+
+
+def author_key(authors):
+    return normalize(authors[0]) if len(authors) else ""
+
+
+def find_groups(norm_embeddings, titles, authors, seed=0):
+    """Group id per row: the smallest row index in its group"""
+    n, dim = norm_embeddings.shape
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    title_keys = [title_key(t) for t in titles]
+    author_keys = [author_key(a) for a in authors]
+
+    # identical (title, author) keys are the same work whatever the embedding says
+    first_with_key = {}
+    for i, key in enumerate(zip(title_keys, author_keys)):
+        if key[0] and key[1]:
+            union(i, first_with_key.setdefault(key, i))
+
+    rng = np.random.default_rng(seed)
+    powers = 1 << np.arange(LSH_BITS, dtype=np.int64)
+    for _ in range(LSH_TABLES):
+        planes = rng.standard_normal((dim, LSH_BITS)).astype(np.float32)
+        signatures = ((norm_embeddings @ planes) > 0) @ powers
+        order = np.argsort(signatures, kind="stable")
+        bounds = np.flatnonzero(np.diff(signatures[order])) + 1
+        for bucket in np.split(order, bounds):
+            if len(bucket) < 2 or len(bucket) > MAX_BUCKET:
+                continue
+            sims = norm_embeddings[bucket] @ norm_embeddings[bucket].T
+            for a, b in zip(*np.nonzero(np.triu(sims >= SIM_THRESHOLD, k=1))):
+                i, j = bucket[a], bucket[b]
+                if author_keys[i] and author_keys[i] == author_keys[j]:
+                    union(i, j)
+
+    return np.array([find(i) for i in range(n)], dtype=np.int32)
+
+
+def load_groups(version, path=GROUPS_NPZ):
+    """Groups saved by the offline pass for this catalog version, or None"""
+    try:
+        with np.load(path) as saved:
+            if str(saved["version"]) != version:
+                return None
+            return saved["groups"]
+    except FileNotFoundError:
+        return None
+
+
+if __name__ == "__main__":
+    import catalog
+
+    df = catalog.read_catalog()
+    arrays = catalog.build_arrays(df, np.load(catalog.EMBEDDINGS_NPY))
+    groups = find_groups(arrays["norm_embeddings"], df["title"], df["authors"])
+    np.savez(GROUPS_NPZ, version=catalog.catalog_version(df), groups=groups)
+    print(f"{len(df)} books in {len(np.unique(groups))} edition groups", file=sys.stderr)
@@ -0,0 +1,128 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"^[A-Za-z0-9-]{8,64}$")
+
+
+def valid_token(token):
+    return isinstance(token, str) and bool(TOKEN_RE.match(token))
+
+
+class FavoritesStore:
+    """Favorites per anonymous user token, persisted in SQLite.
+
+    Next to the favorite set each token has a profile row: the running sum of
+    its favorites' unit embeddings and their count. Adding or removing one
+    favorite updates the sum in O(dim), so recommendations read the profile
+    directly instead of re-averaging the whole favorites list.
+    """
+
+    def __init__(self, path, dim):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._pid = None
+        self._db()
+
+    def _db(self):
+        # a SQLite connection must not cross fork(); workers forked after
+        # import (gunicorn --preload) each open their own on first use
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS favorites (
+                    token TEXT NOT NULL,
+                    book_id TEXT NOT NULL,
+                    added_at REAL NOT NULL,
+                    PRIMARY KEY (token, book_id)
+                );
+                CREATE TABLE IF NOT EXISTS profiles (
+                    token TEXT PRIMARY KEY,
+                    vector_sum BLOB NOT NULL,
+                    count INTEGER NOT NULL
+                );
+            """)
+        return self._conn
+
+    def add(self, token, book_id, vector):
+        """Add a favorite; False if it was already there"""
+        return self._update(token, book_id, vector, adding=True)
+
+    def remove(self, token, book_id, vector):
+        """Remove a favorite; False if it was not there"""
+        return self._update(token, book_id, vector, adding=False)
+
+    def favorite_ids(self, token):
+        with self._lock:
+            return self._favorite_ids(self._db(), token)
+
+    def favorites(self, token):
+        """(favorite_ids, profile) as of one moment, never half of an update.
+
+        The profile is the mean of the favorites' unit embeddings, or None
+        without favorites.
+        """
+        # reads share the connection with _update, so they take the same lock
+        # rather than seeing its uncommitted transaction half way through
+        with self._lock:
+            conn = self._db()
+            return self._favorite_ids(conn, token), self._profile(conn, token)
+
+    def _favorite_ids(self, conn, token):
+        rows = conn.execute(
+            "SELECT book_id FROM favorites WHERE token = ? ORDER BY added_at", (token,)
+        ).fetchall()
+        return [book_id for (book_id,) in rows]
+
+    def _profile(self, conn, token):
+        row = conn.execute(
+            "SELECT vector_sum, count FROM profiles WHERE token = ?", (token,)
+        ).fetchone()
+        if row is None or row[1] == 0:
+            return None
+        return (np.frombuffer(row[0], dtype=np.float64) / row[1]).astype(np.float32)
+
+    def _update(self, token, book_id, vector, adding):
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if adding:
+                    changed = conn.execute(
+                        "INSERT OR IGNORE INTO favorites (token, book_id, added_at) VALUES (?, ?, ?)",
+                        (token, book_id, time.time()),
+                    ).rowcount
+                else:
+                    changed = conn.execute(
+                        "DELETE FROM favorites WHERE token = ? AND book_id = ?", (token, book_id)
+                    ).rowcount
+                if changed:
+                    self._update_profile(conn, token, vector, 1 if adding else -1)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return bool(changed)
+
+    def _update_profile(self, conn, token, vector, sign):
+        row = conn.execute(
+            "SELECT vector_sum, count FROM profiles WHERE token = ?", (token,)
+        ).fetchone()
+        if row is None:
+            vector_sum, count = np.zeros(self.dim), 0
+        else:
+            vector_sum, count = np.frombuffer(row[0], dtype=np.float64).copy(), row[1]
+        count += sign
+        # start from exact zeros again instead of carrying rounding error forward
+        vector_sum = vector_sum + sign * np.asarray(vector, dtype=np.float64) if count else np.zeros(self.dim)
+        conn.execute(
+            "INSERT OR REPLACE INTO profiles (token, vector_sum, count) VALUES (?, ?, ?)",
+            (token, vector_sum.tobytes(), count),
+        )
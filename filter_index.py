@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class FilterIndex:
+    """Precomputed structures for restricting the catalog before scoring.
+
+    Genres are few and dense, so each gets a packed bitmap (one bit per row).
+    Authors are many and sparse, so each gets a sorted posting list of row
+    indices instead. average_rating and ratings_count are kept sorted with
+    their row order, which turns a threshold into a single searchsorted.
+    """
+
+    def __init__(self, genres, authors, ratings, ratings_counts):
+        self.n = len(genres)
+
+        genre_rows = {}
+        author_rows = {}
+        for i, (book_genres, book_authors) in enumerate(zip(genres, authors)):
+            for genre in book_genres:
+                genre_rows.setdefault(genre, []).append(i)
+            for author in book_authors:
+                author_rows.setdefault(author, []).append(i)
+
+        self.genre_bitmaps = {}
+        for genre, rows in genre_rows.items():
+            mask = np.zeros(self.n, dtype=bool)
+            mask[rows] = True
+            self.genre_bitmaps[genre] = np.packbits(mask)
+        self.author_postings = {a: np.array(rows, dtype=np.int32) for a, rows in author_rows.items()}
+
+        self._rating_order = np.argsort(ratings, kind="stable").astype(np.int32)
+        self._rating_sorted = np.asarray(ratings)[self._rating_order]
+        self._count_order = np.argsort(ratings_counts, kind="stable").astype(np.int32)
+        self._count_sorted = np.asarray(ratings_counts)[self._count_order]
+
+    @property
+    def genres(self):
+        return sorted(self.genre_bitmaps)
+
+    def candidates(self, genres=None, authors=None, min_rating=None, min_ratings_count=None):
+        """Sorted row indices passing every filter, or None when no filter is set.
+
+        Several genres (or several authors) match any of them; different
+        filters must all match.
+        """
+        bits = None
+
+        def restrict(other):
+            return other if bits is None else bits & other
+
+        if genres:
+            genre_bits = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+            for genre in genres:
+                if genre in self.genre_bitmaps:
+                    genre_bits |= self.genre_bitmaps[genre]
+            bits = restrict(genre_bits)
+        if authors:
+            rows = [self.author_postings[a] for a in authors if a in self.author_postings]
+            bits = restrict(self._rows_to_bits(np.concatenate(rows) if rows else []))
+        if min_rating is not None:
+            start = np.searchsorted(self._rating_sorted, min_rating, side="left")
+            bits = restrict(self._rows_to_bits(self._rating_order[start:]))
+        if min_ratings_count is not None:
+            start = np.searchsorted(self._count_sorted, min_ratings_count, side="left")
+            bits = restrict(self._rows_to_bits(self._count_order[start:]))
+
+        if bits is None:
+            return None
+        return np.flatnonzero(np.unpackbits(bits, count=self.n)).astype(np.int32)
+
+    def _rows_to_bits(self, rows):
+        mask = np.zeros(self.n, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
@@ -0,0 +1,331 @@
+"""Load-testing harness: how many concurrent users can one instance take?
+
+Starts app.py locally (or targets --url) and drives N simulated sessions, each
+with its own Gradio session, through a realistic flow: initial load, Load
+More, shuffle, keyword search, semantic search, adding favorites and
+refreshing recommendations. Like a browser, each session also fetches the
+cover of every card it renders for the first time. Reports p50/p95/p99
+latency per event, throughput and the server's resident memory growth per
+session, and saves the run as JSON so versions can be compared.
+
+    python loadtest.py --sessions 20 --iterations 3
+    python loadtest.py --compare loadtest_results/a.json loadtest_results/b.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+from gradio_client import Client
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(APP_DIR, "loadtest_results")
+KEYWORD_QUERIES = ["harry", "king", "love", "war", "fantasy", "history", "the", "night", "mystery", "science"]
+SEMANTIC_QUERIES = [
+    "a cozy mystery in a small english village",
+    "epic fantasy with dragons and political intrigue",
+    "a moving memoir about growing up poor",
+    "hard science fiction about first contact",
+    "a funny novel about a dysfunctional family",
+    "historical fiction set during world war two",
+]
+STREAMING_EVENTS = {"semantic_search", "refresh_recommendations", "favorite_event"}
+CARD_ID_RE = re.compile(r"data-id='([^']+)'")
+BROWSER_CONNECTIONS = 6  # image requests a browser runs in parallel per host
+
+
+def rss_bytes(pid):
+    """Resident set size of a process, from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def wait_until_up(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                return
+        except OSError:
+            time.sleep(1)
+    raise TimeoutError(f"{url} did not come up within {timeout}s")
+
+
+def start_app(port, workdir):
+    # a fresh thumbnail cache too, so every run starts from cold covers
+    env = dict(os.environ, PORT=str(port), HOST="127.0.0.1",
+               BOOKREC_FAVORITES_DB=os.path.join(workdir, "favorites.db"),
+               BOOKREC_THUMB_DIR=os.path.join(workdir, "thumbnails"))
+    return subprocess.Popen([sys.executable, "app.py"], cwd=APP_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def git_version():
+    try:
+        return subprocess.check_output(
+            ["git", "describe", "--always", "--dirty"], cwd=APP_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, event, seconds):
+        with self._lock:
+            self.latencies.setdefault(event, []).append(seconds)
+
+    def error(self, event, exc):
+        with self._lock:
+            self.errors.setdefault(event, []).append(repr(exc)[:200])
+
+
+def timed_call(client, recorder, event, *args):
+    """The event's final outputs, or None if it failed"""
+    start = time.perf_counter()
+    try:
+        if event in STREAMING_EVENTS:
+            # time to the first streamed update is what the user perceives
+            job = client.submit(*args, api_name=f"/{event}")
+            for _ in job:
+                recorder.add(f"{event}:first", time.perf_counter() - start)
+                break
+            outputs = job.result()
+        else:
+            outputs = client.predict(*args, api_name=f"/{event}")
+        recorder.add(event, time.perf_counter() - start)
+        return outputs
+    except Exception as exc:
+        recorder.error(event, exc)
+        return None
+
+
+def card_ids(outputs):
+    """Book ids of the cards in an event's rendered HTML, in order"""
+    outputs = outputs if isinstance(outputs, (list, tuple)) else [outputs]
+    return [book_id for output in outputs if isinstance(output, str) for book_id in CARD_ID_RE.findall(output)]
+
+
+def fetch_cover(url, recorder, book_id):
+    """One card's cover, following the redirect to the thumbnail like an <img> does"""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(f"{url}/covers/book/{urllib.parse.quote(book_id)}") as response:
+            response.read()
+        recorder.add("cover", time.perf_counter() - start)
+    except Exception as exc:
+        recorder.error("cover", exc)
+
+
+def run_session(url, book_ids, recorder, iterations, think, seed):
+    rng = random.Random(seed)
+    client = Client(url, verbose=False)
+    token = str(uuid.uuid4())
+
+    # covers already fetched come from the browser's cache; grids that are
+    # re-rendered whole only cost requests for their new cards
+    seen_covers = set()
+
+    def pause():
+        time.sleep(rng.uniform(0, think))
+
+    with ThreadPoolExecutor(max_workers=BROWSER_CONNECTIONS) as covers:
+        def step(event, *args):
+            new = [book_id for book_id in dict.fromkeys(card_ids(timed_call(client, recorder, event, *args)))
+                   if book_id not in seen_covers]
+            seen_covers.update(new)
+            list(covers.map(partial(fetch_cover, url, recorder), new))
+
+        step("initial_feeds")
+        for _ in range(iterations):
+            for _ in range(2):
+                pause()
+                step("load_more")
+            pause()
+            step("shuffle")
+            pause()
+            step("load_more_popular")
+            pause()
+            step("keyword_search", rng.choice(KEYWORD_QUERIES))
+            pause()
+            step("load_more")
+            pause()
+            step("semantic_search", rng.choice(SEMANTIC_QUERIES), [], 0)
+            pause()
+            step("load_more")
+            for book_id in rng.sample(book_ids, 3):
+                pause()
+                event = json.dumps({"token": token, "op": "add", "id": book_id, "seq": rng.random()})
+                step("favorite_event", event, "blend")
+            pause()
+            step("refresh_recommendations", token, "blend")
+            pause()
+            step("load_more_recommendations")
+
+
+def sample_book_ids(url):
+    with urllib.request.urlopen(f"{url}/v1/search/keyword?q=e&limit=100") as response:
+        return [r["id"] for r in json.load(response)["results"]]
+
+
+def summarize(recorder, wall_seconds):
+    events = {}
+    total = 0
+    for event, values in sorted(recorder.latencies.items()):
+        ms = np.array(values) * 1000
+        events[event] = {
+            "count": len(values),
+            "p50_ms": round(float(np.percentile(ms, 50)), 1),
+            "p95_ms": round(float(np.percentile(ms, 95)), 1),
+            "p99_ms": round(float(np.percentile(ms, 99)), 1),
+            "errors": len(recorder.errors.get(event, [])),
+        }
+        if ":" not in event:
+            total += len(values)
+    for event, errors in recorder.errors.items():
+        events.setdefault(event, {"count": 0, "errors": len(errors)})
+    return events, total / wall_seconds if wall_seconds else 0.0
+
+
+def print_report(report):
+    print(f"version {report['version']}, {report['config']['sessions']} sessions, "
+          f"{report['throughput_eps']:.1f} events/s over {report['wall_seconds']:.1f}s")
+    print(f"{'event':34} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for event, s in report["events"].items():
+        print(f"{event:34} {s['count']:>6} {s.get('p50_ms', '-'):>9} {s.get('p95_ms', '-'):>9} "
+              f"{s.get('p99_ms', '-'):>9} {s['errors']:>7}")
+    memory = report["memory"]
+    if memory["rss_before_mb"] is not None:
+        print(f"rss {memory['rss_before_mb']} MB -> {memory['rss_after_mb']} MB "
+              f"(peak {memory['rss_peak_mb']} MB, {memory['growth_per_session_kb']} KB/session)")
+
+
+def compare(paths):
+    reports = [json.load(open(p)) for p in paths]
+    events = sorted(set().union(*(r["events"] for r in reports)))
+    print(f"{'p95 ms':34} " + " ".join(f"{r['version'][:16]:>16}" for r in reports))
+    for event in events:
+        row = [str(r["events"].get(event, {}).get("p95_ms", "-")) for r in reports]
+        print(f"{event:34} " + " ".join(f"{v:>16}" for v in row))
+    print(f"{'throughput events/s':34} " + " ".join(f"{r['throughput_eps']:>16.1f}" for r in reports))
+    print(f"{'growth KB/session':34} " + " ".join(
+        f"{str(r['memory']['growth_per_session_kb']):>16}" for r in reports))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=2, help="times each session repeats the flow")
+    parser.add_argument("--think", type=float, default=0.5, help="max think time between events, seconds")
+    parser.add_argument("--url", help="target a running instance instead of starting app.py")
+    parser.add_argument("--pid", type=int, help="server pid for memory sampling when using --url")
+    parser.add_argument("--port", type=int, default=7861)
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--out", help="where to save the JSON report")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT", help="compare saved reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    server = None
+    url, pid = args.url, args.pid
+    if url is None:
+        server = start_app(args.port, workdir)
+        url, pid = f"http://127.0.0.1:{args.port}", server.pid
+    url = url.rstrip("/")
+
+    try:
+        wait_until_up(url, args.startup_timeout)
+        book_ids = sample_book_ids(url)
+        # one throwaway session so imports, caches and lazy loading don't count as growth
+        run_session(url, book_ids, Recorder(), 1, 0, seed=-1)
+
+        rss_before = rss_bytes(pid) if pid else None
+        rss_peak = rss_before
+        recorder = Recorder()
+        done = threading.Event()
+
+        def sample_memory():
+            nonlocal rss_peak
+            while not done.wait(0.5):
+                rss = rss_bytes(pid)
+                if rss is not None and (rss_peak is None or rss > rss_peak):
+                    rss_peak = rss
+
+        if pid:
+            threading.Thread(target=sample_memory, daemon=True).start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            futures = [
+                pool.submit(run_session, url, book_ids, recorder, args.iterations, args.think, seed)
+                for seed in range(args.sessions)
+            ]
+            for future in futures:
+                future.result()
+        wall = time.perf_counter() - start
+        done.set()
+        rss_after = rss_bytes(pid) if pid else None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    events, throughput = summarize(recorder, wall)
+
+    def mb(value):
+        return round(value / 2**20, 1) if value is not None else None
+
+    report = {
+        "version": git_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "wall_seconds": round(wall, 2),
+        "throughput_eps": round(throughput, 2),
+        "events": events,
+        "memory": {
+            "rss_before_mb": mb(rss_before),
+            "rss_after_mb": mb(rss_after),
+            "rss_peak_mb": mb(rss_peak),
+            "growth_per_session_kb": (
+                round((rss_after - rss_before) / 1024 / args.sessions, 1)
+                if rss_before is not None and rss_after is not None else None
+            ),
+        },
+        "error_samples": {event: errors[:5] for event, errors in recorder.errors.items()},
+    }
+    print_report(report)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{report['timestamp'].replace(':', '')}-{report['version']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class ResultCursor:
+    """Lazily ranked results for one query.
+
+    Keeps the scores of the candidates that have not been served yet. Pages
+    come out of a small sorted buffer; when it runs dry the next block is cut
+    from the remaining candidates with argpartition, so a deep scroll never
+    rescores or fully sorts the catalog.
+
+    With groups (a group id per catalog row), only the best book of each group
+    is served; the rest are skipped as they come up.
+    """
+
+    def __init__(self, scores, block_size=100, candidates=None, groups=None):
+        # scores line up with candidates (row indices) when a filter
+        # restricted scoring, otherwise with every row of the catalog
+        self.block_size = block_size
+        rows = np.arange(len(scores)) if candidates is None else np.asarray(candidates)
+        keep = np.isfinite(scores)
+        self._cand = rows[keep].astype(np.int32)
+        self._cand_scores = scores[keep].astype(np.float32)
+        self._buffer = np.empty(0, dtype=np.int32)
+        self.served = np.empty(0, dtype=np.int32)
+        self.groups = groups
+        self._served_groups = set()
+
+    def has_more(self):
+        """Whether the next page would return at least one result"""
+        return self._skip_served_groups()
+
+    def next_page(self, n):
+        """Row indices of the next n best results, best first"""
+        page = []
+        while len(page) < n and self._skip_served_groups():
+            take, self._buffer = self._buffer[:n - len(page)], self._buffer[n - len(page):]
+            if self.groups is None:
+                page.extend(take)
+                continue
+            for row in take:
+                group = self.groups[row]
+                if group not in self._served_groups:
+                    self._served_groups.add(group)
+                    page.append(row)
+        page = np.array(page, dtype=np.int32)
+        self.served = np.concatenate([self.served, page])
+        return page
+
+    def _skip_served_groups(self):
+        """Drop buffered rows whose group was already served, refilling as needed.
+
+        Afterwards the buffer starts with a servable row; False if none is left.
+        """
+        while True:
+            if not len(self._buffer):
+                if not len(self._cand):
+                    return False
+                self._refill(self.block_size)
+            if self.groups is None:
+                return True
+            for i, row in enumerate(self._buffer):
+                if self.groups[row] not in self._served_groups:
+                    self._buffer = self._buffer[i:]
+                    return True
+            self._buffer = self._buffer[:0]
+
+    def _refill(self, k):
+        k = min(k, len(self._cand))
+        order = np.argpartition(-self._cand_scores, k - 1)
+        top, rest = order[:k], order[k:]
+        top = top[np.argsort(-self._cand_scores[top], kind="stable")]
+        self._buffer = np.concatenate([self._buffer, self._cand[top]])
+        self._cand, self._cand_scores = self._cand[rest], self._cand_scores[rest]
@@ -0,0 +1,176 @@
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+MAX_KEY_LEN = 40  # queries are cut to this; nobody types a longer prefix
+MAX_SUFFIX_WORDS = 6  # "hobbit" should find "The Hobbit", but not every word of long titles
+PRECOMPUTED_PREFIX_LEN = 2
+ARRAY_NAMES = ("suggest_text", "suggest_text_ends", "suggest_label_weights", "suggest_starts", "suggest_labels")
+
+
+def normalize(text):
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def author_names(authors):
+    """Every author once, in order of first appearance; author labels index into this"""
+    return list(dict.fromkeys(author for book_authors in authors for author in book_authors))
+
+
+def build_arrays(titles, authors, ratings_counts):
+    """The index as flat numpy arrays, ready to publish or memory-map.
+
+    Every label (a catalog row, then every author) has its normalized text
+    stored once, UTF-8 encoded, in one text blob; the text of label j ends at
+    text_ends[j]. A key is a suffix of a label's text starting at a word, so
+    the sorted keys are just (start offset, label) pairs: key i is
+    text[starts[i]:text_ends[labels[i]]]. UTF-8 byte order is code point
+    order, so keys can be binary searched as bytes.
+    """
+    names = author_names(authors)
+    author_index = {name: i for i, name in enumerate(names)}
+    label_weights = np.zeros(len(titles) + len(names), dtype=np.int64)
+    label_weights[:len(titles)] = ratings_counts
+    texts, text_ends = [], []
+    # typed arrays rather than lists of int objects keep the build's peak memory down
+    keys, starts, labels = [], array("q"), array("i")
+    end = 0
+
+    def add_label(text, max_words):
+        nonlocal end
+        start = end
+        words = text.encode().split(b" ") if text else []
+        for i, word in enumerate(words):
+            if i < max_words:
+                keys.append(b" ".join(words[i:]))
+                starts.append(start)
+                labels.append(len(text_ends))
+            start += len(word) + 1
+        encoded = b" ".join(words)
+        texts.append(encoded)
+        end += len(encoded)
+        text_ends.append(end)
+
+    for title, book_authors, count in zip(titles, authors, ratings_counts):
+        # a missing title (NaN/None) keeps its label but gets no keys
+        add_label(normalize(title) if isinstance(title, str) else "", MAX_SUFFIX_WORDS)
+        for author in book_authors:
+            label_weights[len(titles) + author_index[author]] += count
+    for name in names:
+        add_label(normalize(name), len(name))  # "tolkien" should find "J.R.R. Tolkien"
+
+    order = np.argsort(np.array(keys, dtype=object), kind="stable")
+    keys.clear()
+    return {
+        "suggest_text": np.frombuffer(b"".join(texts), dtype=np.uint8),
+        "suggest_text_ends": np.array(text_ends, dtype=np.int64),
+        "suggest_label_weights": label_weights,
+        "suggest_starts": np.frombuffer(starts, dtype=np.int64)[order].astype(np.uint32),
+        "suggest_labels": np.frombuffer(labels, dtype=np.int32)[order],
+    }
+
+
+class SortedKeys:
+    """Sequence view of the sorted keys, so bisect can search them in place"""
+
+    def __init__(self, text, text_ends, starts, labels):
+        self.text = text
+        self.text_ends = text_ends
+        self.starts = starts
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        return self.text[self.starts[i]:self.text_ends[self.labels[i]]].tobytes()
+
+
+class SuggestIndex:
+    """Prefix index over normalized titles and author names for type-ahead.
+
+    Keys are kept sorted (as offsets into one text blob, see build_arrays), so
+    every key starting with a prefix sits in the contiguous range found by two
+    binary searches. The best suggestions in that range come from an
+    argpartition over their labels' weights (ratings_count). One- and
+    two-letter prefixes can cover a large share of the catalog, so their
+    answers are precomputed.
+
+    The arrays are plain numpy, so a shared catalog can publish them and
+    workers pass the memory-mapped copies in as arrays.
+    """
+
+    def __init__(self, titles, authors, ratings_counts, book_ids, limit=10, arrays=None):
+        self.limit = limit
+        self.titles = np.asarray(titles, dtype=object)
+        self.book_ids = book_ids
+        self.author_names = author_names(authors)
+        if arrays is None:
+            arrays = build_arrays(titles, authors, ratings_counts)
+        self.keys = SortedKeys(
+            arrays["suggest_text"], arrays["suggest_text_ends"], arrays["suggest_starts"], arrays["suggest_labels"]
+        )
+        self.label_weights = arrays["suggest_label_weights"]
+        self.entry_labels = arrays["suggest_labels"]
+
+        self._short = {}
+        for prefix in self._short_prefixes():
+            self._short[prefix] = self._lookup(prefix, limit)
+
+    def suggest(self, query, limit=None):
+        """Up to limit suggestions for the normalized query, most rated first"""
+        limit = limit or self.limit
+        prefix = normalize(query)[:MAX_KEY_LEN]
+        if not prefix:
+            return []
+        if len(prefix) <= PRECOMPUTED_PREFIX_LEN and limit <= self.limit:
+            return self._short.get(prefix, [])[:limit]
+        return self._lookup(prefix, limit)
+
+    def _short_prefixes(self):
+        """Every distinct key prefix up to PRECOMPUTED_PREFIX_LEN characters"""
+        prefixes = set()
+        i = 0
+        while i < len(self.keys):
+            key = self.keys[i].decode()
+            prefixes.update(key[:n] for n in range(1, PRECOMPUTED_PREFIX_LEN + 1))
+            if len(key) < PRECOMPUTED_PREFIX_LEN:
+                i += 1
+            else:
+                # jump over the rest of the keys sharing this prefix
+                i = bisect_left(self.keys, key[:PRECOMPUTED_PREFIX_LEN].encode() + b"\xff", i)
+        return prefixes
+
+    def _lookup(self, prefix, limit):
+        prefix = prefix.encode()
+        lo = bisect_left(self.keys, prefix)
+        # 0xff never occurs in UTF-8, so this sorts after every key with the prefix
+        hi = bisect_left(self.keys, prefix + b"\xff", lo)
+        if lo == hi:
+            return []
+
+        # over-fetch: one title can match several of its own suffix keys
+        k = min(hi - lo, limit * 4)
+        weights = self.label_weights[self.entry_labels[lo:hi]]
+        top = np.argpartition(-weights, k - 1)[:k] if k < hi - lo else np.arange(hi - lo)
+        top = top[np.argsort(-weights[top], kind="stable")]
+
+        results = []
+        seen = set()
+        for label in self.entry_labels[lo + top]:
+            if label in seen:
+                continue
+            seen.add(label)
+            if label < len(self.titles):
+                results.append({"kind": "title", "text": str(self.titles[label]), "id": self.book_ids[label]})
+            else:
+                results.append({"kind": "author", "text": self.author_names[label - len(self.titles)], "id": None})
+            if len(results) == limit:
+                break
+        return results
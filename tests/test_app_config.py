@@ -0,0 +1,46 @@
+"""The config the page is rendered from, as the page script sees it.
+
+loadtest.py and gradio_client call the app's events directly, which works
+even when the page script has nothing to write into; these checks cover
+that path instead. Importing app loads the model and the catalog, so they
+are skipped where those are not available.
+"""
+import os
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# components the page script writes into
+SCRIPT_INPUTS = ("favorite-event-input",)
+
+
+@pytest.fixture(scope="module")
+def config(tmp_path_factory):
+    pytest.importorskip("sentence_transformers")
+    import catalog
+    for name in (catalog.CATALOG_CSV, catalog.EMBEDDINGS_NPY):
+        if not os.path.exists(os.path.join(REPO_DIR, name)):
+            pytest.skip(f"{name} is not available")
+    workdir = tmp_path_factory.mktemp("app")
+    with pytest.MonkeyPatch.context() as mp:
+        # the catalog paths are relative to the repository root
+        mp.chdir(REPO_DIR)
+        mp.setenv("BOOKREC_FAVORITES_DB", str(workdir / "favorites.db"))
+        mp.setenv("BOOKREC_THUMB_DIR", str(workdir / "thumbnails"))
+        mp.delenv("BOOKREC_SHARED_DIR", raising=False)
+        import app
+    return app.demo.get_config_file()
+
+
+@pytest.mark.parametrize("elem_id", SCRIPT_INPUTS)
+def test_script_inputs_are_rendered(config, elem_id):
+    components = [c for c in config["components"] if c.get("props", {}).get("elem_id") == elem_id]
+    assert len(components) == 1, f"#{elem_id} is missing"
+    # visible=False is not rendered at all, so the page script has nothing to write into
+    assert components[0]["props"].get("visible") is not False
+
+
+def test_favorite_events_are_not_merged(config):
+    (dependency,) = [d for d in config["dependencies"] if d.get("api_name") == "favorite_event"]
+    # rapid clicks send one event each; any other trigger mode can drop some
+    assert dependency["trigger_mode"] == "multiple"
@@ -0,0 +1,28 @@
+import numpy as np
+
+from edition_groups import find_groups, title_key
+
+
+def unit_rows(n, dim=16, seed=0):
+    rows = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_title_key_drops_series_and_edition_words():
+    assert title_key("The Hobbit (Middle-earth, #0) Deluxe Illustrated Edition") == "the hobbit"
+    assert title_key(float("nan")) == ""
+    assert title_key(None) == ""
+
+
+def test_same_title_and_author_are_grouped():
+    groups = find_groups(
+        unit_rows(3),
+        ["Dune", "Dune (Deluxe Edition)", "Dune"],
+        [["Frank Herbert"], ["Frank Herbert"], ["Someone Else"]],
+    )
+    assert list(groups) == [0, 0, 2]
+
+
+def test_missing_titles_by_one_author_stay_apart():
+    groups = find_groups(unit_rows(3), [float("nan"), None, float("nan")], [["Ann Author"]] * 3)
+    assert list(groups) == [0, 1, 2]
@@ -0,0 +1,100 @@
+import threading
+
+import numpy as np
+import pytest
+
+from favorites_store import FavoritesStore
+
+DIM = 8
+TOKEN = "test-token-1"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FavoritesStore(str(tmp_path / "favorites.db"), DIM)
+
+
+def unit_vectors(n, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_add_and_remove_report_whether_anything_changed(store):
+    (vector,) = unit_vectors(1)
+    assert store.add(TOKEN, "a", vector)
+    assert not store.add(TOKEN, "a", vector)
+    assert store.favorite_ids(TOKEN) == ["a"]
+    assert store.remove(TOKEN, "a", vector)
+    assert not store.remove(TOKEN, "a", vector)
+    assert store.favorite_ids(TOKEN) == []
+
+
+def test_repeated_add_does_not_count_twice(store):
+    a, b = unit_vectors(2)
+    store.add(TOKEN, "a", a)
+    store.add(TOKEN, "a", a)
+    store.add(TOKEN, "b", b)
+    _, profile = store.favorites(TOKEN)
+    np.testing.assert_allclose(profile, (a + b) / 2, atol=1e-6)
+
+
+def test_profile_is_the_mean_of_current_favorites(store):
+    vectors = unit_vectors(5)
+    for i, vector in enumerate(vectors):
+        store.add(TOKEN, str(i), vector)
+    store.remove(TOKEN, "1", vectors[1])
+    store.remove(TOKEN, "3", vectors[3])
+    ids, profile = store.favorites(TOKEN)
+    assert ids == ["0", "2", "4"]
+    np.testing.assert_allclose(profile, vectors[[0, 2, 4]].mean(axis=0), atol=1e-6)
+
+
+def test_profile_resets_when_the_last_favorite_goes(store):
+    a, b = unit_vectors(2)
+    store.add(TOKEN, "a", a)
+    store.add(TOKEN, "b", b)
+    store.remove(TOKEN, "a", a)
+    store.remove(TOKEN, "b", b)
+    assert store.favorites(TOKEN) == ([], None)
+    vector_sum, count = store._db().execute(
+        "SELECT vector_sum, count FROM profiles WHERE token = ?", (TOKEN,)
+    ).fetchone()
+    assert count == 0
+    assert not np.frombuffer(vector_sum, dtype=np.float64).any()
+    # no rounding error from the earlier adds and removes carries over
+    store.add(TOKEN, "b", b)
+    assert np.array_equal(store.favorites(TOKEN)[1], b)
+
+
+def test_tokens_are_independent(store):
+    a, b = unit_vectors(2)
+    store.add(TOKEN, "a", a)
+    store.add("test-token-2", "b", b)
+    assert store.favorites(TOKEN)[0] == ["a"]
+    np.testing.assert_allclose(store.favorites("test-token-2")[1], b, atol=1e-6)
+
+
+def test_favorites_reads_ids_and_profile_together(store):
+    vectors = unit_vectors(20)
+    done = threading.Event()
+
+    def churn():
+        while not done.is_set():
+            for i, vector in enumerate(vectors):
+                store.add(TOKEN, str(i), vector)
+            for i, vector in enumerate(vectors):
+                store.remove(TOKEN, str(i), vector)
+
+    writer = threading.Thread(target=churn)
+    writer.start()
+    try:
+        for _ in range(300):
+            ids, profile = store.favorites(TOKEN)
+            if not ids:
+                assert profile is None
+                continue
+            expected = vectors[[int(i) for i in ids]].mean(axis=0)
+            np.testing.assert_allclose(profile, expected, atol=1e-5)
+    finally:
+        done.set()
+        writer.join()
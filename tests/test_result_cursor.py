@@ -0,0 +1,86 @@
+import numpy as np
+
+from result_cursor import ResultCursor
+
+
+def drain(cursor, n):
+    pages = []
+    while cursor.has_more():
+        page = cursor.next_page(n)
+        assert len(page), "has_more() promised a non-empty page"
+        pages.append(page)
+    assert len(cursor.next_page(n)) == 0
+    return pages
+
+
+def best_per_group(scores, groups, rows=None):
+    """Reference answer: the best finite row of each group, in score order"""
+    rows = np.arange(len(scores)) if rows is None else np.asarray(rows)
+    order = np.argsort(-scores, kind="stable")
+    seen, expected = set(), []
+    for i in order:
+        if np.isfinite(scores[i]) and groups[rows[i]] not in seen:
+            seen.add(groups[rows[i]])
+            expected.append(rows[i])
+    return expected
+
+
+def test_pages_follow_score_order_without_groups():
+    scores = np.random.default_rng(0).random(250)
+    cursor = ResultCursor(scores.copy(), block_size=40)
+    pages = drain(cursor, 12)
+    assert [len(p) for p in pages] == [12] * 20 + [10]
+    assert list(np.concatenate(pages)) == list(np.argsort(-scores, kind="stable"))
+    assert list(cursor.served) == list(np.concatenate(pages))
+
+
+def test_serves_the_best_book_of_each_group_in_score_order():
+    rng = np.random.default_rng(1)
+    scores = rng.random(500)
+    groups = rng.integers(0, 60, size=500)
+    cursor = ResultCursor(scores.copy(), block_size=25, groups=groups)
+    served = np.concatenate(drain(cursor, 7))
+    assert list(served) == best_per_group(scores, groups)
+
+
+def test_has_more_is_false_when_only_served_groups_remain():
+    # rows 0-2 are the best books of groups 0-2; everything after is a
+    # lower-scored edition of one of them, so the second page would be empty
+    scores = np.array([0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3])
+    groups = np.array([0, 1, 2, 0, 1, 2, 0])
+    cursor = ResultCursor(scores, block_size=100, groups=groups)
+    assert list(cursor.next_page(3)) == [0, 1, 2]
+    assert not cursor.has_more()
+    assert len(cursor.next_page(3)) == 0
+
+
+def test_has_more_refills_past_a_block_of_served_groups():
+    # the first block after the first page holds only duplicates; the one
+    # new group sits in a later block, which has_more() has to refill into
+    scores = np.linspace(1.0, 0.0, 12)
+    groups = np.array([0, 1] * 5 + [2, 1])
+    cursor = ResultCursor(scores, block_size=2, groups=groups)
+    assert list(cursor.next_page(2)) == [0, 1]
+    assert cursor.has_more()
+    assert list(cursor.next_page(2)) == [10]
+    assert not cursor.has_more()
+
+
+def test_candidates_and_masked_scores():
+    candidates = np.array([3, 8, 11, 20, 21])
+    scores = np.array([0.2, -np.inf, 0.9, 0.5, 0.4])  # aligned with candidates
+    groups = np.zeros(30, dtype=int)
+    groups[[3, 8, 11, 20, 21]] = [1, 2, 3, 4, 3]
+    cursor = ResultCursor(scores, block_size=2, candidates=candidates, groups=groups)
+    served = np.concatenate(drain(cursor, 2))
+    # 8 is masked, 21 shares a group with the better-scored 11
+    assert list(served) == [11, 20, 3]
+    assert list(served) == best_per_group(scores, groups, candidates)
+
+
+def test_empty_scores():
+    for scores in (np.empty(0), np.full(4, -np.inf)):
+        cursor = ResultCursor(scores, block_size=10, groups=np.zeros(4, dtype=int))
+        assert not cursor.has_more()
+        assert len(cursor.next_page(12)) == 0
+        assert len(cursor.served) == 0
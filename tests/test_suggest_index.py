@@ -0,0 +1,25 @@
+import numpy as np
+
+from suggest_index import SuggestIndex
+
+
+def make_index(titles, authors):
+    counts = np.arange(len(titles), 0, -1) * 10
+    return SuggestIndex(titles, authors, counts, np.array([str(i) for i in range(len(titles))]))
+
+
+def test_prefix_matches_titles_and_authors_most_rated_first():
+    index = make_index(
+        ["The Hobbit", "Hobbit Houses", "Dune"],
+        [["J.R.R. Tolkien"], ["Ann Builder"], ["Frank Herbert"]],
+    )
+    assert [s["text"] for s in index.suggest("hobb")] == ["The Hobbit", "Hobbit Houses"]
+    assert index.suggest("tolk") == [{"kind": "author", "text": "J.R.R. Tolkien", "id": None}]
+    assert index.suggest("d")[0] == {"kind": "title", "text": "Dune", "id": "2"}
+
+
+def test_missing_titles_are_not_suggested():
+    index = make_index(["Nancy Drew", float("nan"), None], [["Carolyn Keene"], ["Someone"], ["Someone"]])
+    assert [s["text"] for s in index.suggest("n")] == ["Nancy Drew"]
+    assert index.suggest("none") == []
+    assert index.suggest("so") == [{"kind": "author", "text": "Someone", "id": None}]
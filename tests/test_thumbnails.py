@@ -0,0 +1,94 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+from thumbnails import NAME_RE, THUMB_SIZE, ThumbnailCache, http_fetch
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def image_server(tmp_path):
+    """A local stand-in for the cover host, serving one 300x450 PNG"""
+    root = tmp_path / "covers"
+    root.mkdir()
+    Image.new("RGB", (300, 450), (200, 40, 40)).save(root / "cover.png")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(root)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class CountingFetch:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.urls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, url):
+        with self._lock:
+            self.urls.append(url)
+        time.sleep(self.delay)
+        return http_fetch(url)
+
+
+def test_thumbnail_is_fetched_resized_and_cached(tmp_path, image_server):
+    fetch = CountingFetch()
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), fetch=fetch)
+    url = f"{image_server}/cover.png"
+
+    name = cache.thumbnail(url)
+    assert NAME_RE.match(name)
+    with Image.open(cache.path(name)) as thumb:
+        assert thumb.width <= THUMB_SIZE[0] and thumb.height <= THUMB_SIZE[1]
+
+    assert cache.thumbnail(url) == name
+    assert fetch.urls == [url]
+
+
+def test_names_depend_only_on_content(tmp_path, image_server):
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), fetch=CountingFetch())
+    name = cache.thumbnail(f"{image_server}/cover.png")
+    data = io.BytesIO()
+    Image.new("RGB", (300, 450), (200, 40, 40)).save(data, format="PNG")
+    assert cache.import_image("https://elsewhere.example/same.png", data.getvalue()) == name
+
+
+def test_missing_cover_is_remembered(tmp_path, image_server):
+    fetch = CountingFetch()
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), fetch=fetch)
+    url = f"{image_server}/missing.png"
+
+    assert cache.thumbnail(url) is None
+    assert cache.thumbnail(url) is None
+    assert cache.lookup(url) == (True, None)
+    assert fetch.urls == [url]
+
+
+def test_concurrent_misses_share_one_fetch(tmp_path, image_server):
+    fetch = CountingFetch(delay=0.2)
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), fetch=fetch)
+    url = f"{image_server}/cover.png"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        names = list(pool.map(cache.thumbnail, [url] * 8))
+
+    assert len(set(names)) == 1 and names[0] is not None
+    assert fetch.urls == [url]
+
+
+def test_path_rejects_anything_but_thumbnail_names(tmp_path):
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), fetch=CountingFetch())
+    assert cache.path("../index.db") is None
+    assert cache.path("0" * 32 + ".jpg") is None  # well-formed, but not stored
@@ -0,0 +1,178 @@
+"""Local cache of resized cover thumbnails.
+
+Covers are fetched (or imported) once, shrunk to card size and written to disk
+under the SHA-256 of the resized bytes. A file name therefore never changes
+meaning and can be served with an immutable, year-long cache header; only the
+small url -> name table in SQLite is ever updated.
+
+    python thumbnails.py warm            # fetch every catalog cover
+    python thumbnails.py import <dir>    # use local originals named <book id>.<ext>
+"""
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+
+from PIL import Image
+
+THUMB_SIZE = (150, 220)
+NAME_RE = re.compile(r"^[0-9a-f]{32}\.jpg$")
+RETRY_FAILED_AFTER = 24 * 3600  # seconds before a cover that failed is fetched again
+
+
+def http_fetch(url, timeout=5):
+    request = urllib.request.Request(url, headers={"User-Agent": "book-rec-thumbnailer"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+class ThumbnailCache:
+    """Maps cover URLs to resized thumbnails stored under content-hash names.
+
+    fetch is any callable returning the bytes at a URL, which keeps the cache
+    testable against a local stand-in image server.
+    """
+
+    def __init__(self, directory, size=THUMB_SIZE, fetch=http_fetch):
+        self.directory = directory
+        self.size = size
+        self.fetch = fetch
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._inflight = {}  # url -> Future of its thumbnail name, while one request fetches it
+        self._inflight_lock = threading.Lock()
+        self._pid = None
+        self._db()
+
+    def _db(self):
+        # a SQLite connection must not cross fork(); see FavoritesStore._db
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._conn = sqlite3.connect(
+                os.path.join(self.directory, "index.db"), check_same_thread=False, isolation_level=None, timeout=10
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS thumbnails (
+                    url TEXT PRIMARY KEY,
+                    name TEXT,
+                    checked_at REAL NOT NULL
+                )
+            """)
+        return self._conn
+
+    def path(self, name):
+        """On-disk path for a thumbnail name, or None for anything that is not one"""
+        if not NAME_RE.match(name):
+            return None
+        path = os.path.join(self.directory, name[:2], name)
+        return path if os.path.exists(path) else None
+
+    def lookup(self, url):
+        """(known, name) from the index without fetching; name is None for a failed cover"""
+        row = self._db().execute("SELECT name, checked_at FROM thumbnails WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return False, None
+        name, checked_at = row
+        if name is None and time.time() - checked_at > RETRY_FAILED_AFTER:
+            return False, None
+        return True, name
+
+    def thumbnail(self, url):
+        """Thumbnail name for url, fetching and resizing it on first use; None if unavailable.
+
+        Concurrent calls for the same uncached url share one fetch.
+        """
+        if not url:
+            return None
+        known, name = self.lookup(url)
+        if known:
+            return name
+        with self._inflight_lock:
+            future = self._inflight.get(url)
+            fetching = future is None
+            if fetching:
+                future = self._inflight[url] = Future()
+        if not fetching:
+            return future.result()
+
+        name = None
+        try:
+            # a fetch that finished since our lookup has already been remembered
+            known, name = self.lookup(url)
+            if not known:
+                try:
+                    name = self.store(self.fetch(url))
+                except Exception:
+                    name = None
+                self._remember(url, name)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[url]
+            future.set_result(name)
+        return name
+
+    def import_image(self, url, data):
+        """Use local image bytes as the cover for url instead of fetching it"""
+        name = self.store(data)
+        self._remember(url, name)
+        return name
+
+    def store(self, data):
+        """Resize image bytes to a thumbnail on disk and return its name"""
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert("RGB")
+            image.thumbnail(self.size)
+            out = io.BytesIO()
+            image.save(out, format="JPEG", quality=82, optimize=True)
+        thumb = out.getvalue()
+
+        name = hashlib.sha256(thumb).hexdigest()[:32] + ".jpg"
+        target_dir = os.path.join(self.directory, name[:2])
+        target = os.path.join(target_dir, name)
+        if not os.path.exists(target):
+            os.makedirs(target_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=target_dir)
+            with os.fdopen(fd, "wb") as f:
+                f.write(thumb)
+            os.replace(tmp, target)
+        return name
+
+    def _remember(self, url, name):
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO thumbnails (url, name, checked_at) VALUES (?, ?, ?)",
+                (url, name, time.time()),
+            )
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    import catalog
+
+    cache = ThumbnailCache(os.environ.get("BOOKREC_THUMB_DIR", "thumbnails"))
+    df = catalog.read_catalog()
+    if len(sys.argv) == 2 and sys.argv[1] == "warm":
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            names = list(pool.map(cache.thumbnail, df["image_url"].fillna("")))
+        print(f"{sum(n is not None for n in names)}/{len(names)} covers cached", file=sys.stderr)
+    elif len(sys.argv) == 3 and sys.argv[1] == "import":
+        urls = dict(zip(df["id"].astype(str), df["image_url"]))
+        imported = 0
+        for file_name in os.listdir(sys.argv[2]):
+            book_id = os.path.splitext(file_name)[0]
+            if book_id in urls:
+                with open(os.path.join(sys.argv[2], file_name), "rb") as f:
+                    cache.import_image(urls[book_id], f.read())
+                imported += 1
+        print(f"{imported} covers imported", file=sys.stderr)
+    else:
+        sys.exit("usage: python thumbnails.py warm | import <dir>")